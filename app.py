@@ -1,29 +1,10 @@
 from model.predict import predict_news
+from model.keywords import build_search_term, standalone_backend
 from scrapers.twitter_scraper import fetch_tweets
 from scrapers.reddit_scraper import fetch_reddit_posts
 from scrapers.google_news_scraper import fetch_google_news
-from keybert import KeyBERT
+from scrapers.prefetch import get_prefetcher
 
-# === Load keyword extractor ===
-kw_model = KeyBERT()
-
-def build_search_term(text: str) -> str:
-    words = text.split()
-    if len(words) <= 12:
-        return text 
-    
-
-    keywords = kw_model.extract_keywords(
-        text,
-        keyphrase_ngram_range=(1, 2),
-        stop_words="english",
-        top_n=3,
-    )
-    keyphrases = [kw for kw, _ in keywords if len(kw.split()) > 1]
-    if not keyphrases:
-        keyphrases = [kw for kw, _ in keywords]
-
-    return " ".join(keyphrases)
 
 def display_posts(posts, source):
     if not posts:
@@ -50,18 +31,26 @@ if label.upper() == "FAKE":
     exit(0)
 
 # === Step 4: Extract keywords ===
-search_term = build_search_term(user_input)
+search_term = build_search_term(user_input, standalone_backend())
 print(f"\n🔑 Keywords used for context: {search_term}")
 
 # === Step 5: Fetch REAL context ===
+# Trending terms may already be materialized by a running service (scrapers/prefetch.py).
+stored = {}
+prefetcher = get_prefetcher()
+if prefetcher is not None:
+    prefetcher.record(search_term)
+    prefetcher.flush()
+    stored = {name: [post.to_dict() for post in posts] for name, posts in prefetcher.lookup(search_term).items()}
+
 print("\n📡 Fetching related Twitter posts...")
 twitter_posts = fetch_tweets(search_term, max_results=5)
 
 print("\n📡 Fetching related Reddit posts...")
-reddit_posts = fetch_reddit_posts(search_term, limit=5)
+reddit_posts = stored["reddit"] if "reddit" in stored else fetch_reddit_posts(search_term, limit=5)
 
 print("\n📡 Fetching related Google News headlines...")
-google_posts = fetch_google_news(search_term, max_results=5)
+google_posts = stored["google"] if "google" in stored else fetch_google_news(search_term, max_results=5)
 
 # === Step 6: Display results ===
 print("\n🧠 SOCIAL CONTEXT (shown only for REAL predictions)\n------------------------------------------------")
@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import statistics
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ML_SERVICE_DIR = os.path.join(PROJECT_ROOT, "ml-service")
+
+WORDS = ("government report election market storm vaccine court city police "
+         "study climate school budget senator official health border").split()
+
+
+def add_project_paths():
+    """Make `model.*`, `scrapers.*` and ml-service's `app.*` importable."""
+    for path in (PROJECT_ROOT, ML_SERVICE_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def random_headline(rng, min_words=6, max_words=20):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+
+def text_of_length(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def summarize(latencies):
+    """Latency stats in milliseconds."""
+    ordered = sorted(latencies)
+    return {
+        "n": len(ordered),
+        "mean_ms": 1000 * statistics.fmean(ordered),
+        "p50_ms": 1000 * ordered[len(ordered) // 2],
+        "p95_ms": 1000 * ordered[max(0, int(len(ordered) * 0.95) - 1)],
+    }
+
+
+def time_calls(fn, repeats, warmup=2):
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def environment():
+    def git(*args):
+        try:
+            return subprocess.check_output(["git", *args], cwd=PROJECT_ROOT, text=True).strip()
+        except Exception:
+            return None
+
+    env = {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain")),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    try:
+        import torch
+        env["torch"] = torch.__version__
+        env["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return env
+
+
+def write_json(data, path):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"[INFO] Wrote {path}")
@@ -0,0 +1,192 @@
+"""
+Benchmark suite for the inference and API hot paths.
+
+Suites:
+    predict      predict_news latency by input length, predict_news_batch by batch size
+    search_term  build_search_term cost for short and long inputs, per keyword backend
+    api          end-to-end /predict_explain throughput at a given concurrency
+                 (in-process ASGI client, scrapers replaced by local stubs)
+
+Result caches are disabled so every call does real work. Results go to JSON
+together with the commit and environment, so runs can be compared:
+
+    python benchmarks/run.py --out bench_new.json
+    python benchmarks/run.py --compare bench_main.json bench_new.json --threshold 0.10
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+os.environ.setdefault("PREDICT_CACHE_SIZE", "0")
+os.environ.setdefault("ML_WARMUP", "0")
+
+from common import add_project_paths, random_headline, text_of_length, time_calls, summarize, environment, write_json
+
+add_project_paths()
+
+import stubs
+
+SUITES = ("predict", "search_term", "api")
+
+
+def bench_predict(args):
+    from model import predict
+
+    predict.warmup()
+    rng = random.Random(0)
+    results = {"by_length": {}, "by_batch_size": {}}
+
+    for words in args.lengths:
+        text = text_of_length(rng, words)
+        results["by_length"][str(words)] = time_calls(lambda: predict.predict_news(text), args.repeats)
+
+    for batch_size in args.batch_sizes:
+        texts = [random_headline(rng) for _ in range(batch_size)]
+        stats = time_calls(lambda: predict.predict_news_batch(texts), args.repeats)
+        stats["items_per_s"] = 1000 * batch_size / stats["mean_ms"]
+        results["by_batch_size"][str(batch_size)] = stats
+
+    return results
+
+
+def bench_search_term(args):
+    from model import keywords
+
+    rng = random.Random(1)
+    results = {}
+    for backend in args.keyword_backends:
+        results[backend] = {}
+        for name, words in (("short", 10), ("long", 60)):
+            # Fresh text per call: the per-text cache would otherwise hide the cost.
+            texts = iter([text_of_length(rng, words) for _ in range(args.repeats + 2)])
+            results[backend][name] = time_calls(
+                lambda: keywords.build_search_term(next(texts), backend), args.repeats
+            )
+    return results
+
+
+async def _drive_api(app, texts, concurrency):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(text):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/predict_explain", json={"text": text})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(t) for t in texts))
+        elapsed = time.perf_counter() - start
+
+    stats = summarize(latencies)
+    stats["rps"] = len(texts) / elapsed
+    return stats
+
+
+def bench_api(args):
+    from app import main
+
+    stubs.install(main, delay_s=args.stub_delay_ms / 1000)
+    main.warm_up_model()
+
+    rng = random.Random(2)
+    texts = [random_headline(rng, 6, 40) for _ in range(args.requests)]
+    # --concurrency and --stub-delay-ms are recorded under "config", not here.
+    return asyncio.run(_drive_api(main.app, texts, args.concurrency))
+
+
+def _flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + "."))
+        elif isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+# Only these measurements are compared; anything else under "results" is context.
+LOWER_IS_BETTER = ("mean_ms", "p50_ms", "p95_ms")
+HIGHER_IS_BETTER = ("rps", "items_per_s")
+
+
+def compare(baseline, current, threshold):
+    """Print metric changes; return the metrics that regressed beyond threshold."""
+    base = _flatten(baseline["results"])
+    cur = _flatten(current["results"])
+    regressions = []
+
+    print(f"{'metric':<50} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key in sorted(set(base) & set(cur)):
+        metric = key.rsplit(".", 1)[-1]
+        lower_is_better = metric in LOWER_IS_BETTER
+        higher_is_better = metric in HIGHER_IS_BETTER
+        if not (lower_is_better or higher_is_better) or not base[key]:
+            continue
+        change = (cur[key] - base[key]) / base[key]
+        worse = change > threshold if lower_is_better else change < -threshold
+        flag = "  REGRESSION" if worse else ""
+        print(f"{key:<50} {base[key]:>10.2f} {cur[key]:>10.2f} {change:>+7.1%}{flag}")
+        if worse:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[8, 32, 96, 256],
+                        help="input lengths (words) for predict_news")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--keyword-backends", nargs="+", default=["classifier", "lexical", "keybert"],
+                        help="build_search_term backends to measure")
+    parser.add_argument("--requests", type=int, default=200, help="requests for the api suite")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stub-delay-ms", type=float, default=0.0,
+                        help="simulated latency of each stubbed scraper call")
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        import json
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n[FAIL] {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n[OK] No regressions")
+        return
+
+    runners = {"predict": bench_predict, "search_term": bench_search_term, "api": bench_api}
+    output = {"environment": environment(), "config": vars(args), "results": {}}
+    # Fixed order: importing the API enables micro-batching, which the
+    # predict suite should not measure.
+    for suite in SUITES:
+        if suite in args.suites:
+            print(f"[INFO] Running {suite} ...")
+            output["results"][suite] = runners[suite](args)
+            print(f"  {output['results'][suite]}")
+
+    if args.out:
+        write_json(output, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Local stand-ins for the social-context sources so benchmarks never touch the network."""
+import time
+
+from scrapers.base import Source, Post
+
+
+class StubSource(Source):
+    def __init__(self, name, delay_s=0.0):
+        self.name = name
+        self.delay_s = delay_s
+        # No rate limit to speak of: the benchmark measures the service, not the limiter.
+        super().__init__(rate=1e9, burst=10 ** 9, max_in_flight=1024, timeout=60.0)
+
+    def cache_key(self, query, limit):
+        # Unique per call, so the scraper cache never short-circuits the stub.
+        return (self.name, query, limit, time.perf_counter_ns())
+
+    def fetch(self, query, limit):
+        time.sleep(self.delay_s)
+        return [Post(text=f"{query} {self.name} {i}", url=f"https://{self.name}.invalid/{i}", source=self.name)
+                for i in range(limit)]
+
+
+def install(main_module, delay_s=0.0):
+    """Replace the sources used by ml-service's app.main with these stubs."""
+    main_module.SOCIAL_SOURCES = [StubSource("reddit", delay_s), StubSource("google", delay_s)]
+    # Every lookup goes to the stubs, never to posts prefetched by a real service.
+    main_module.get_prefetcher = lambda: None
@@ -0,0 +1,127 @@
+"""
+Requests/sec and memory of the ML service against gunicorn worker count.
+
+Starts `gunicorn -c gunicorn.conf.py app.main:app` in ml-service/ once per
+worker count, drives /predict_batch (single-text requests, caches off, no
+network) at a fixed concurrency, and records throughput plus RSS and PSS
+summed over the master and workers. PSS counts shared weight pages once
+across processes, so it shows what the shared-weights mode saves.
+
+Run from the project root:
+    python benchmarks/workers.py --workers 1 2 4 --concurrency 16 --out bench_workers.json
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+import requests
+
+from common import ML_SERVICE_DIR, random_headline, environment, write_json
+
+
+def wait_ready(url, proc, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            if requests.get(f"{url}/ready", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    raise TimeoutError("service did not become ready")
+
+
+def memory_mb(pid):
+    master = psutil.Process(pid)
+    procs = [master] + master.children(recursive=True)
+    rss = pss = 0
+    for p in procs:
+        info = p.memory_full_info()
+        rss += info.rss
+        pss += getattr(info, "pss", info.rss)
+    return rss / 1e6, pss / 1e6
+
+
+def run_load(url, requests_total, concurrency, seed):
+    rng = random.Random(seed)
+    bodies = [{"texts": [random_headline(rng)]} for _ in range(requests_total)]
+    session = requests.Session()
+
+    def one(body):
+        start = time.perf_counter()
+        session.post(f"{url}/predict_batch", json=body, timeout=60).raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(one, bodies))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests_total,
+        "rps": requests_total / elapsed,
+        "p50_ms": 1000 * latencies[len(latencies) // 2],
+        "p95_ms": 1000 * latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def bench(worker_count, args):
+    port = args.port
+    url = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        ML_WORKERS=str(worker_count),
+        ML_BIND=f"127.0.0.1:{port}",
+        PREDICT_CACHE_SIZE="0",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=ML_SERVICE_DIR, env=env,
+    )
+    try:
+        wait_ready(url, proc)
+        # Every worker warms up on its own; give the others a moment.
+        run_load(url, worker_count * 4, worker_count, seed=0)
+        result = run_load(url, args.requests, args.concurrency, seed=1)
+        result["rss_mb"], result["pss_mb"] = memory_mb(proc.pid)
+        result["workers"] = worker_count
+        return result
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.workers:
+        print(f"[INFO] Benchmarking {n} worker(s) ...")
+        r = bench(n, args)
+        print(f"  rps={r['rps']:.1f} p50={r['p50_ms']:.1f}ms p95={r['p95_ms']:.1f}ms "
+              f"rss={r['rss_mb']:.0f}MB pss={r['pss_mb']:.0f}MB")
+        results.append(r)
+
+    print(f"\n{'workers':>7} {'req/s':>8} {'p95 ms':>8} {'RSS MB':>8} {'PSS MB':>8}")
+    for r in results:
+        print(f"{r['workers']:>7} {r['rps']:>8.1f} {r['p95_ms']:>8.1f} {r['rss_mb']:>8.0f} {r['pss_mb']:>8.0f}")
+
+    if args.out:
+        write_json({"environment": environment(), "concurrency": args.concurrency, "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,180 @@
 import sys
 import os
 import random
+import asyncio
+import time
+import threading
+from contextlib import asynccontextmanager
 from typing import List, Optional, Dict
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from keybert import KeyBERT
 
-app = FastAPI()
+from .metrics import (
+    timed, observe_stage, observe_request_stage, observe_batch, record_error, update_cache_gauges,
+    start_request_timing, server_timing_header, generate_latest, CONTENT_TYPE_LATEST, REQUEST_SECONDS,
+)
+from .profiler import profiler
 
 # --- Path Magic to import from root ---
 # We need to import 'model.predict' which is at the project root level (relative to this service).
-# But 'model.predict' assumes CWD is project root to load "model/bert_fakenews".
-# So we temporarily switch CWD to project root for the import.
+# 'model.predict' resolves its model directory relative to its own file, so no chdir is needed.
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, "../../"))
 sys.path.append(project_root)
 
-original_cwd = os.getcwd()
 try:
-    os.chdir(project_root)
     # Check if model/predict.py exists or if it's just predict.py
     if os.path.exists(os.path.join(project_root, "model", "predict.py")):
-        from model.predict import predict_news, tokenizer
+        from model.predict import (
+            predict_news, predict_news_batch, enable_batching, warmup, preload_for_fork,
+            prediction_cache, invalidate_prediction_cache, MODEL_VERSION, CACHE_SIZE, CACHE_TTL_S, CACHE_DB,
+            near_dup_index, NEAR_DUP_THRESHOLD, NEAR_DUP_MIN_CONFIDENCE, NEAR_DUP_DB,
+        )
+        from model.cache import PredictionCache
+        from model.near_dup import NearDupIndex
+        from model.instrumentation import add_stage_observer, add_batch_observer, add_caller_observer
+        from model.keywords import build_search_term, get_kw_model, KEYWORD_BACKEND
+        from model.explain import predict_explain, enable_batching as enable_explain_batching, EXPLAIN_METHOD, METHOD_NAMES
     elif os.path.exists(os.path.join(project_root, "predict.py")):
-        from predict import predict_news, tokenizer
+        from predict import (
+            predict_news, predict_news_batch, enable_batching, warmup, preload_for_fork,
+            prediction_cache, invalidate_prediction_cache, MODEL_VERSION, CACHE_SIZE, CACHE_TTL_S, CACHE_DB,
+            near_dup_index, NEAR_DUP_THRESHOLD, NEAR_DUP_MIN_CONFIDENCE, NEAR_DUP_DB,
+        )
+        from cache import PredictionCache
+        from near_dup import NearDupIndex
+        from instrumentation import add_stage_observer, add_batch_observer, add_caller_observer
+        from keywords import build_search_term, get_kw_model, KEYWORD_BACKEND
+        from explain import predict_explain, enable_batching as enable_explain_batching, EXPLAIN_METHOD, METHOD_NAMES
     else:
         # Fallback for robustness, though we expect it in model/predict.py based on checks
         raise ImportError("Could not find predict.py in model/ or root")
 
+    # Tokenize / forward / highlights timings and batch sizes -> /metrics
+    add_stage_observer(observe_stage)
+    add_batch_observer(observe_batch)
+    # Stages run by the micro-batcher's worker -> the waiting request's Server-Timing
+    add_caller_observer(observe_request_stage)
+
+    # Concurrent requests share padded forwards instead of one forward each.
+    # Tune with PREDICT_BATCH_WINDOW_MS / PREDICT_MAX_BATCH_SIZE.
+    if os.getenv("ML_BATCHING", "1") == "1":
+        enable_batching()
+        enable_explain_batching()
+
+    # Caches prediction + explanation + search term for /predict_explain.
+    # Social context is not cached here (it changes over time).
+    explain_cache = PredictionCache(
+        "predict_explain", max_size=CACHE_SIZE, ttl=CACHE_TTL_S, db_path=CACHE_DB, version=MODEL_VERSION
+    )
+    # Rephrasings of an already-explained headline reuse its result
+    # (PREDICT_NEAR_DUP_THRESHOLD, see model/near_dup.py).
+    explain_near_dup = NearDupIndex(
+        "near_dup_predict_explain", threshold=NEAR_DUP_THRESHOLD, min_confidence=NEAR_DUP_MIN_CONFIDENCE,
+        max_size=CACHE_SIZE, db_path=NEAR_DUP_DB, version=MODEL_VERSION,
+    )
+
     # Import scrapers
-    from scrapers.google_news_scraper import fetch_google_news
-    from scrapers.reddit_scraper import fetch_reddit_posts
+    from scrapers.base import CircuitOpen, SourceBusy
+    from scrapers.google_news_scraper import google_news_source
+    from scrapers.reddit_scraper import reddit_source
+    from scrapers.prefetch import fan_out_prefetched, get_prefetcher, start_prefetching
+    SOCIAL_SOURCES = [reddit_source, google_news_source]
 
 except ImportError as e:
     # If dependencies are missing in the env, this will fail.
     print(f"Error importing model or scrapers: {e}")
     # Define dummy placeholders so app can at least start (though endpoint will fail)
     def predict_news(text): raise NotImplementedError("Model not loaded")
-    def fetch_google_news(query, max_results=5): return []
-    def fetch_reddit_posts(query, limit=5): return []
-    tokenizer = None
-finally:
-    # Restore CWD so we don't confuse other things if needed
-    os.chdir(original_cwd)
-
-# --- Init KeyBERT ---
-try:
-    kw_model = KeyBERT()
-except Exception as e:
-    print(f"Warning: KeyBERT failed to initialize: {e}")
-    kw_model = None
+    def predict_news_batch(texts): raise NotImplementedError("Model not loaded")
+    def predict_explain(text): raise NotImplementedError("Model not loaded")
+    SOCIAL_SOURCES = []
+    async def fan_out_prefetched(prefetcher, sources, query, limit, deadline=None): return; yield
+    def get_prefetcher(): return None
+    def start_prefetching(): return None
+    class CircuitOpen(Exception): pass
+    class SourceBusy(Exception): pass
+    def invalidate_prediction_cache(): pass
+    def warmup(): raise NotImplementedError("Model not loaded")
+    def preload_for_fork(): pass
+    def build_search_term(text, keyphrases=None): return text
+    def get_kw_model(): return None
+    KEYWORD_BACKEND = None
+    prediction_cache = None
+    explain_cache = None
+    near_dup_index = None
+    explain_near_dup = None
+    MODEL_VERSION = None
+    EXPLAIN_METHOD = None
+    METHOD_NAMES = {}
 
-def build_search_term(text: str) -> str:
-    if not kw_model:
-        return text
-    
-    words = text.split()
-    if len(words) <= 12:
-        return text 
-
-    keywords = kw_model.extract_keywords(
-        text,
-        keyphrase_ngram_range=(1, 2),
-        stop_words="english",
-        top_n=3,
-    )
-    keyphrases = [kw for kw, _ in keywords if len(kw.split()) > 1]
-    if not keyphrases:
-        keyphrases = [kw for kw, _ in keywords]
+# --- Model lifecycle ---
+# The model is loaded and warmed up in a background thread at startup, so the
+# process accepts connections immediately. /health is liveness; /ready only
+# succeeds once a warm-up inference has completed (with ML_WARMUP=0: once the
+# first request's inference has).
+
+WARMUP_ON_STARTUP = os.getenv("ML_WARMUP", "1") == "1"
+service_state = {"ready": False, "error": None}
+
+def warm_up_model():
+    try:
+        warmup()
+        predict_explain("Warm-up headline for the fake news classifier.")
+        service_state["ready"] = True
+        print("[INFO] Model loaded and warmed up")
+    except Exception as e:
+        service_state["error"] = str(e)
+        print(f"[ERROR] Model warm-up failed: {e}")
+
+# ML_PRELOAD=1 is set by gunicorn.conf.py (preload_app): weights are loaded
+# here, in the master, and shared by the forked workers. Each worker still
+# runs its own warm-up inference after fork.
+PRELOAD = os.getenv("ML_PRELOAD", "0") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=warm_up_model, name="model-warmup", daemon=True).start()
+    # Runs in each worker (after fork); the sqlite lease lets one refresh at a time.
+    prefetcher = start_prefetching()
+    yield
+    if prefetcher is not None:
+        prefetcher.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+# Runtime sampling profiler (/debug/profiler/*). The endpoints answer 404 until
+# enabled, at startup with ML_PROFILER=1 or at runtime with
+# POST /debug/profiler/enable. Enabling at runtime needs ML_DEBUG_TOKEN to be
+# set and a matching X-Debug-Token header.
+profiler_state = {"enabled": os.getenv("ML_PROFILER", "0") == "1"}
+DEBUG_TOKEN = os.getenv("ML_DEBUG_TOKEN") or None
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    # Send `X-Server-Timing: 1` (or set SERVER_TIMING=1) to get per-stage
+    # durations back in a Server-Timing header.
+    timings = start_request_timing(request.headers)
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
 
-    return " ".join(keyphrases)
+    route = request.scope.get("route")
+    REQUEST_SECONDS.labels(endpoint=route.path if route else "other").observe(elapsed)
+    if timings is not None:
+        response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    return response
+
+if PRELOAD:
+    preload_for_fork()
+    # KeyBERT is a second model; it is only loaded when KEYWORD_BACKEND=keybert.
+    if KEYWORD_BACKEND == "keybert":
+        get_kw_model()
 
 # --- Pydantic Models ---
 
@@ -99,88 +203,127 @@ class PredictResponse(BaseModel):
     explanation: Explanation
     social_context: List[SocialPost]
 
-# --- Logic ---
+class BatchPredictRequest(BaseModel):
+    texts: List[str]
 
-@app.post("/predict_explain", response_model=PredictResponse)
-def predict_explain_endpoint(request: PredictRequest):
-    text = request.text
-    
-    # 1. Get Prediction
-    try:
-        label, confidence, probs = predict_news(text)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Model prediction failed: {str(e)}")
+class BatchPrediction(BaseModel):
+    label: str
+    confidence: float
+    probs: List[float]
 
-    # 2. Generate Explanation (MVP Heuristic)
-    # "Pick top 8 tokens by a simple heuristic (e.g., longer alphabetic tokens, excluding stopwords/punctuation)."
-    
-    if tokenizer:
-        tokens = tokenizer.tokenize(text)
-    else:
-        tokens = text.split() # Fallback
-
-    # Filter candidates: alphabetic and len > 3 is a decent proxy for "content words"
-    # We also want to map them back to the text or just return the tokens as spans.
-    # The requirement says "span": "<token_or_phrase>"
-    
-    candidates = []
-    seen = set()
-    for t in tokens:
-        # Clean up token (BERT tokens often start with ##)
-        clean_t = t.replace("##", "")
-        if clean_t.isalpha() and len(clean_t) > 3 and clean_t.lower() not in seen:
-            candidates.append(clean_t)
-            seen.add(clean_t.lower())
-    
-    # Sort by length (heuristic: longer words are more specific?) or just take first 8?
-    # "Pick top 8 tokens by a simple heuristic" -> Let's sort by length descending.
-    candidates.sort(key=len, reverse=True)
-    top_tokens = candidates[:8]
-    
-    highlights = []
-    for token_str in top_tokens:
-        # Score: min(1.0, confidence + small jitter based on token length)
-        # Jitter: len(token) * 0.01
-        jitter = len(token_str) * 0.01
-        score = min(1.0, confidence + jitter)
-        highlights.append(Highlight(span=token_str, score=score))
+class BatchPredictResponse(BaseModel):
+    results: List[BatchPrediction]
+
+# --- Logic ---
+
+# Each source has its own per-attempt timeout, retries, rate limit and circuit
+# breaker (REDDIT_TIMEOUT_S, GOOGLE_NEWS_TIMEOUT_S, ...; see scrapers/base.py).
+# Posts still missing at SOCIAL_CONTEXT_DEADLINE_S are dropped. Trending search
+# terms are served from the prefetch store (SOCIAL_PREFETCH_*, scrapers/prefetch.py).
+SOCIAL_CONTEXT_DEADLINE_S = float(os.getenv("SOCIAL_CONTEXT_DEADLINE_S", "4"))
 
+def build_explanation(label: str, confidence: float, highlights) -> Explanation:
     summary_text = f"The model predicts this is {label} with {confidence:.2f} confidence."
 
-    explanation = Explanation(
+    return Explanation(
         summary=summary_text,
-        method="simple_rationale_v1",
-        highlights=highlights
+        method=METHOD_NAMES.get(EXPLAIN_METHOD, EXPLAIN_METHOD),
+        highlights=[Highlight(span=span, score=score) for span, score in highlights]
     )
 
-    # 3. Fetch Social Context (only if REAL, per app.py logic)
+def reuse_near_duplicate(text: str, stored: dict) -> dict:
+    """A near-duplicate's result, keeping only the highlighted words that occur in `text`."""
+    lowered = text.lower()
+    explanation = dict(stored["explanation"])
+    explanation["highlights"] = [h for h in explanation["highlights"] if h["span"].lower() in lowered]
+    return dict(stored, explanation=explanation)
+
+def remember_explain_result(text: str, result: dict):
+    """Exact cache and near-duplicate index; MinHash signing and sqlite writes, so run it in a thread."""
+    explain_cache.set(text, result)
+    explain_near_dup.add(text, result, result["confidence"])
+
+def safe_search_term(text: str, keyphrases=None) -> str:
+    try:
+        with timed("keywords"):
+            return build_search_term(text, keyphrases=keyphrases)
+    except Exception as e:
+        print(f"Error building search term: {e}")
+        record_error("keywords")
+        return text
+
+def error_kind(error: BaseException) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, CircuitOpen):
+        return "circuit_open"
+    if isinstance(error, SourceBusy):
+        return "busy"
+    return "error"
+
+async def fetch_social_context(search_term: str) -> List[SocialPost]:
+    # All sources run concurrently and results are merged as they arrive, so a
+    # slow or failing source only costs its own posts, never the others'.
     social_context = []
-    if label.upper() != "FAKE":
+    async for result in fan_out_prefetched(get_prefetcher(), SOCIAL_SOURCES, search_term, 5,
+                                           deadline=SOCIAL_CONTEXT_DEADLINE_S):
+        if not result.prefetched:  # stored results would skew the source latency histograms
+            observe_stage(result.source, result.seconds)
+        if result.error is not None:
+            print(f"[WARN] {result.source} fetch failed: {result.error!r}")
+            record_error(result.source, error_kind(result.error))
+            continue
+        social_context.extend(SocialPost(**post.to_dict()) for post in result.posts)
+    return social_context
+
+@app.post("/predict_explain", response_model=PredictResponse)
+async def predict_explain_endpoint(request: PredictRequest):
+    text = request.text
+
+    # With PREDICT_CACHE_DB the caches read and write sqlite, so keep them off the event loop.
+    cached = await run_in_threadpool(explain_cache.get, text) if explain_cache else None
+    if cached is None and explain_near_dup:
+        near = await run_in_threadpool(explain_near_dup.lookup, text)
+        if near is not None:
+            cached = reuse_near_duplicate(text, near[0])
+            await run_in_threadpool(explain_cache.set, text, cached)
+
+    if cached is not None:
+        label, confidence, probs = cached["label"], cached["confidence"], cached["probs"]
+        explanation = Explanation(**cached["explanation"])
+        search_term = cached["search_term"]
+    else:
+        # 1 + 2. Prediction and token attributions from one forward (off the event loop)
         try:
-            search_term = build_search_term(text)
-            
-            # Fetch Reddit
-            r_posts = fetch_reddit_posts(search_term, limit=5)
-            for p in r_posts:
-                social_context.append(SocialPost(
-                    text=p['text'],
-                    url=p['url'],
-                    source='reddit'
-                ))
-            
-            # Fetch Google News
-            g_posts = fetch_google_news(search_term, max_results=5)
-            for p in g_posts:
-                social_context.append(SocialPost(
-                    text=p['text'],
-                    url=p['url'],
-                    source='google',
-                    published=p.get('published')
-                ))
-                
+            with timed("model"):  # includes time queued for a batch
+                label, confidence, probs, highlights, keyphrases = await run_in_threadpool(predict_explain, text)
         except Exception as e:
-            print(f"Error fetching social context: {e}")
-            # Continue without context rather than failing the whole request
+            record_error("model")
+            raise HTTPException(status_code=500, detail=f"Model prediction failed: {str(e)}")
+        service_state["ready"] = True
+
+        explanation = build_explanation(label, confidence, highlights)
+
+        # Search term is only needed for REAL predictions (per app.py logic).
+        # With the classifier keyword backend, keyphrases come from the same forward.
+        search_term = None
+        if label.upper() != "FAKE":
+            search_term = await run_in_threadpool(safe_search_term, text, keyphrases)
+
+        if explain_cache:
+            result = {
+                "label": label,
+                "confidence": confidence,
+                "probs": probs,
+                "explanation": jsonable_encoder(explanation),
+                "search_term": search_term,
+            }
+            await run_in_threadpool(remember_explain_result, text, result)
+
+    # 3. Fetch Social Context (only if REAL)
+    social_context = []
+    if search_term is not None:
+        social_context = await fetch_social_context(search_term)
 
     return PredictResponse(
         label=label,
@@ -190,6 +333,89 @@ def predict_explain_endpoint(request: PredictRequest):
         social_context=social_context
     )
 
+@app.post("/predict_batch", response_model=BatchPredictResponse)
+def predict_batch_endpoint(request: BatchPredictRequest):
+    try:
+        predictions = predict_news_batch(request.texts)
+    except Exception as e:
+        record_error("model")
+        raise HTTPException(status_code=500, detail=f"Model prediction failed: {str(e)}")
+    service_state["ready"] = True
+
+    return BatchPredictResponse(results=[
+        BatchPrediction(label=label, confidence=confidence, probs=probs)
+        for label, confidence, probs in predictions
+    ])
+
+@app.get("/cache/stats")
+def cache_stats():
+    caches = [c for c in (prediction_cache, explain_cache, near_dup_index, explain_near_dup) if c is not None]
+    return {"model_version": MODEL_VERSION, "caches": [c.stats() for c in caches]}
+
+@app.post("/cache/invalidate")
+def cache_invalidate():
+    """Call after replacing model/bert_fakenews to drop stale results."""
+    invalidate_prediction_cache()
+    if explain_cache:
+        explain_cache.clear()
+        explain_near_dup.clear()
+    return {"status": "ok"}
+
+@app.get("/metrics")
+def metrics():
+    update_cache_gauges([c for c in (prediction_cache, explain_cache, near_dup_index, explain_near_dup) if c is not None])
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def _require_profiler():
+    if not profiler_state["enabled"]:
+        raise HTTPException(status_code=404, detail="Profiler disabled (POST /debug/profiler/enable or ML_PROFILER=1)")
+
+def _check_debug_token(request: Request):
+    if DEBUG_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Runtime profiler control needs ML_DEBUG_TOKEN")
+    if request.headers.get("x-debug-token") != DEBUG_TOKEN:
+        raise HTTPException(status_code=403, detail="Missing or wrong X-Debug-Token")
+
+@app.post("/debug/profiler/enable")
+def profiler_enable(request: Request):
+    _check_debug_token(request)
+    profiler_state["enabled"] = True
+    return dict(profiler.status(), enabled=True)
+
+@app.post("/debug/profiler/disable")
+def profiler_disable(request: Request):
+    _check_debug_token(request)
+    profiler_state["enabled"] = False
+    profiler.stop()
+    return dict(profiler.status(), enabled=False)
+
+@app.post("/debug/profiler/start")
+def profiler_start(interval_ms: float = 5.0):
+    _require_profiler()
+    profiler.start(interval_ms)
+    return profiler.status()
+
+@app.post("/debug/profiler/stop")
+def profiler_stop():
+    _require_profiler()
+    profiler.stop()
+    return profiler.status()
+
+@app.get("/debug/profiler")
+def profiler_report():
+    """Collapsed stacks (flamegraph.pl / speedscope format)."""
+    _require_profiler()
+    return PlainTextResponse(profiler.collapsed())
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    # Weights alone are not enough: under preload_app they are already loaded
+    # in every forked worker before any inference has run there.
+    if service_state["ready"]:
+        return {"status": "ready", "model_version": MODEL_VERSION}
+    status = "error" if service_state["error"] else "loading"
+    return JSONResponse(status_code=503, content={"status": status, "detail": service_state["error"]})
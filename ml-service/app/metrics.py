@@ -0,0 +1,109 @@
+"""
+Prometheus metrics and Server-Timing support for the ML service.
+
+If prometheus_client is not installed, metrics become no-ops and /metrics
+reports that they are unavailable; the service itself keeps working.
+"""
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; charset=utf-8"
+
+    class _NoopMetric:
+        def __init__(self, *args, **kwargs): pass
+        def labels(self, *args, **kwargs): return self
+        def observe(self, *args): pass
+        def inc(self, *args): pass
+        def set(self, *args): pass
+
+    Counter = Gauge = Histogram = _NoopMetric
+
+    def generate_latest():
+        return b"# prometheus_client is not installed\n"
+
+# Always add a Server-Timing header (otherwise only when the request sends
+# `X-Server-Timing: 1`).
+SERVER_TIMING_ALWAYS = os.getenv("SERVER_TIMING", "0") == "1"
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+STAGE_SECONDS = Histogram(
+    "ml_stage_seconds", "Time spent per pipeline stage", ["stage"], buckets=STAGE_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "ml_request_seconds", "End-to-end request latency", ["endpoint"], buckets=STAGE_BUCKETS
+)
+ERRORS = Counter("ml_errors_total", "Errors by source", ["source", "kind"])
+BATCH_SIZE = Histogram(
+    "ml_batch_size", "Items per model batch", ["kind"], buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+LAST_BATCH_SIZE = Gauge("ml_last_batch_size", "Size of the most recent model batch", ["kind"])
+CACHE_ENTRIES = Gauge("ml_cache_entries", "Entries in the result cache", ["cache"])
+CACHE_HITS = Gauge("ml_cache_hits", "Cache hits since start (or last invalidation)", ["cache"])
+CACHE_MISSES = Gauge("ml_cache_misses", "Cache misses since start (or last invalidation)", ["cache"])
+
+# Per-request list of (stage, seconds); None when Server-Timing is off.
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+def observe_request_stage(stage, seconds):
+    """A stage that ran for this request in another thread (MicroBatcher); histograms already have it."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+def observe_batch(kind, size):
+    BATCH_SIZE.labels(kind=kind).observe(size)
+    LAST_BATCH_SIZE.labels(kind=kind).set(size)
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def record_error(source, kind="error"):
+    ERRORS.labels(source=source, kind=kind).inc()
+
+
+def update_cache_gauges(caches):
+    for cache in caches:
+        stats = cache.stats()
+        CACHE_ENTRIES.labels(cache=stats["namespace"]).set(stats["size"])
+        CACHE_HITS.labels(cache=stats["namespace"]).set(stats["hits"])
+        CACHE_MISSES.labels(cache=stats["namespace"]).set(stats["misses"])
+
+
+def start_request_timing(request_headers):
+    """Returns the timings list for this request, or None if not requested."""
+    if SERVER_TIMING_ALWAYS or request_headers.get("x-server-timing") == "1":
+        timings = []
+        _request_timings.set(timings)
+        return timings
+    return None
+
+
+def server_timing_header(timings, total_seconds):
+    # Stages can repeat (e.g. two scrapers); Server-Timing allows duplicate names.
+    parts = [f"{stage.replace(' ', '_')};dur={seconds * 1000:.1f}" for stage, seconds in timings]
+    parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,82 @@
+"""
+In-process sampling profiler that can be switched on at runtime.
+
+A background thread snapshots every thread's stack at a fixed interval and
+counts identical stacks. The result is in "collapsed" format (one
+`frame;frame;frame count` line per stack), which flamegraph.pl and
+speedscope read directly.
+"""
+import sys
+import time
+import threading
+from collections import Counter
+
+
+MIN_INTERVAL_MS = 1.0  # shorter intervals spend more time sampling than serving
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._counts = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.interval = 0.005
+        self.samples = 0
+        self.started_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms=5.0):
+        if self.running:
+            return
+        self.interval = max(interval_ms, MIN_INTERVAL_MS) / 1000.0
+        self.reset()
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self.samples = 0
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    self._counts[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self):
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in self._counts.most_common())
+
+    def status(self):
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "started_at": self.started_at,
+        }
+
+
+profiler = SamplingProfiler()
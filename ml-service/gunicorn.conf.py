@@ -0,0 +1,37 @@
+"""
+Multi-worker serving with shared model weights.
+
+Run from the ml-service directory:
+    ML_WORKERS=4 gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported once in the master (preload_app), which loads the
+classifier weights before forking. Workers share those pages copy-on-write,
+so each extra worker costs its activations and Python heap, not a full copy
+of the model. Torch intra-op threads are split across workers so N workers
+don't each grab every core.
+"""
+import os
+
+os.environ.setdefault("ML_PRELOAD", "1")
+
+workers = int(os.getenv("ML_WORKERS", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("ML_BIND", "0.0.0.0:8000")
+preload_app = True
+timeout = int(os.getenv("ML_WORKER_TIMEOUT", "120"))
+
+
+def _threads_per_worker():
+    configured = int(os.getenv("ML_TORCH_THREADS", "0"))
+    if configured:
+        return configured
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def post_fork(server, worker):
+    threads = _threads_per_worker()
+
+    # Also applies to an ONNX Runtime session created later in this worker.
+    from model.predict import configure_threads
+    configure_threads(threads)
+    server.log.info(f"worker {worker.pid}: {threads} torch threads")
@@ -1,26 +1,96 @@
+import os
+import time
+import argparse
+import numpy as np
 import pandas as pd
-from predict import predict_news  # import your existing function
+
+# Every row is scored once; caching would only add hashing overhead.
+os.environ.setdefault("PREDICT_CACHE_SIZE", "0")
+
+from predict import predict_news_batch, LABELS  # import your existing function
 
 TEST_FILE = "data/manual_test.csv"
+TEXT_COL = "text"
+LABEL_COL = "label"
+CHUNK_SIZE = 10000
+LABEL_IDS = {name: idx for idx, name in LABELS.items()}
+
+
+def to_label_ids(values):
+    """Accept 0/1 labels or "FAKE"/"REAL" strings."""
+    return np.array([
+        LABEL_IDS[v.upper()] if isinstance(v, str) else int(v)
+        for v in values
+    ], dtype=np.int64)
+
+
+class StreamingMetrics:
+    """Confusion matrix accumulated chunk by chunk; metrics derive from it."""
+
+    def __init__(self, num_classes=len(LABELS)):
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+
+    def update(self, y_true, y_pred):
+        np.add.at(self.confusion, (y_true, y_pred), 1)
+
+    @property
+    def total(self):
+        return int(self.confusion.sum())
+
+    def report(self):
+        tp = np.diag(self.confusion).astype(float)
+        predicted = self.confusion.sum(axis=0)
+        actual = self.confusion.sum(axis=1)
+        precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+        recall = np.divide(tp, actual, out=np.zeros_like(tp), where=actual > 0)
+        denom = precision + recall
+        f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+        return {
+            "accuracy": tp.sum() / self.total if self.total else 0.0,
+            "per_class": {
+                LABELS[i]: {"precision": precision[i], "recall": recall[i], "f1": f1[i], "support": int(actual[i])}
+                for i in range(len(LABELS))
+            },
+            "macro_f1": f1.mean(),
+            "confusion_matrix": self.confusion.tolist(),
+        }
+
 
-def evaluate_model():
-    df = pd.read_csv(TEST_FILE)
+def evaluate_model(test_file=TEST_FILE, chunk_size=CHUNK_SIZE):
+    metrics = StreamingMetrics()
+    scored_s = 0.0
 
-    correct = 0
-    total = len(df)
+    # Stream the CSV so multi-million-row exports never sit in memory at once.
+    for chunk in pd.read_csv(test_file, usecols=[TEXT_COL, LABEL_COL], chunksize=chunk_size):
+        chunk = chunk.dropna()
+        if chunk.empty:
+            continue
+        texts = chunk[TEXT_COL].astype(str).tolist()
 
-    for _, row in df.iterrows():
-        text = row["text"]
-        true_label = row["label"]  # 0 or 1
+        start = time.perf_counter()
+        predictions = predict_news_batch(texts)
+        scored_s += time.perf_counter() - start
 
-        pred_label_str = predict_news(text)
-        pred_label = 0 if pred_label_str == "FAKE" else 1
+        y_pred = np.array([LABEL_IDS[label] for label, _, _ in predictions], dtype=np.int64)
+        metrics.update(to_label_ids(chunk[LABEL_COL].tolist()), y_pred)
+        print(f"[INFO] Scored {metrics.total} rows ({metrics.total / scored_s:.1f} samples/sec)")
 
-        if pred_label == true_label:
-            correct += 1
+    report = metrics.report()
+    correct = int(np.trace(metrics.confusion))
+    print(f"\nModel Accuracy: {report['accuracy']:.4f} ({correct}/{metrics.total})")
+    for name, m in report["per_class"].items():
+        print(f"  {name}: precision={m['precision']:.4f} recall={m['recall']:.4f} "
+              f"f1={m['f1']:.4f} support={m['support']}")
+    print(f"  macro F1: {report['macro_f1']:.4f}")
+    print("Confusion matrix (rows = true, cols = predicted, order FAKE, REAL):")
+    print(metrics.confusion)
+    print(f"Throughput: {metrics.total / scored_s if scored_s else 0.0:.1f} samples/sec")
+    return report
 
-    accuracy = correct / total if total > 0 else 0
-    print(f"Model Accuracy: {accuracy:.4f} ({correct}/{total})")
 
 if __name__ == "__main__":
-    evaluate_model()
+    parser = argparse.ArgumentParser(description="Evaluate the classifier on a labelled CSV.")
+    parser.add_argument("--test-file", default=TEST_FILE)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    evaluate_model(args.test_file, args.chunk_size)
@@ -1,41 +1,50 @@
+import json
+import argparse
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
 DATA_DIR = Path("data")  # folder that contains the 4 CSVs
+SPLITS = [
+    ("gossipcop_fake.csv", "FAKE", "gossipcop"),
+    ("gossipcop_real.csv", "REAL", "gossipcop"),
+    ("politifact_fake.csv", "FAKE", "politifact"),
+    ("politifact_real.csv", "REAL", "politifact"),
+]
+CHUNK_SIZE = 100_000
+REPORT_PATH = "model_output/dataset_report.json"
+DUPLICATE_KEYS = ("news_url", "title")
+NUM_EXAMPLES = 10
 
 
-def load_split(filename: str, label: str, source: str) -> pd.DataFrame:
+def count_tweets(tweet_ids: pd.Series) -> pd.Series:
+    """Number of whitespace-separated IDs per row, without a Python-level loop."""
+    return tweet_ids.fillna("").astype(str).str.count(r"\S+")
+
+
+def add_length_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df["num_tweets"] = count_tweets(df["tweet_ids"])
+    titles = df["title"].astype(str)
+    df["title_char_len"] = titles.str.len()
+    df["title_word_len"] = titles.str.count(r"\S+")
+    return df
+
+
+def load_split(filename: str, label: str, source: str, data_dir=DATA_DIR) -> pd.DataFrame:
     """Load one CSV and add label + source columns."""
-    path = DATA_DIR / filename
+    path = Path(data_dir) / filename
     df = pd.read_csv(path)
     df["label"] = label          # "FAKE" or "REAL"
     df["source"] = source        # "gossipcop" or "politifact"
 
     # tweet_ids is one string with IDs separated by spaces/tabs
-    # convert to number of tweets for basic analysis
-    df["num_tweets"] = (
-        df["tweet_ids"]
-        .fillna("")
-        .astype(str)
-        .apply(lambda x: len(str(x).split()))
-    )
-
-    # length of title
-    df["title_char_len"] = df["title"].astype(str).str.len()
-    df["title_word_len"] = df["title"].astype(str).str.split().str.len()
+    # convert to number of tweets for basic analysis, plus title lengths
+    return add_length_columns(df)
 
-    return df
 
-
-def main():
-    # 1. Load all four datasets
-    gc_fake  = load_split("gossipcop_fake.csv",  "FAKE", "gossipcop")
-    gc_real  = load_split("gossipcop_real.csv",  "REAL", "gossipcop")
-    pf_fake  = load_split("politifact_fake.csv", "FAKE", "politifact")
-    pf_real  = load_split("politifact_real.csv", "REAL", "politifact")
-
-    # 2. Combine
-    df = pd.concat([gc_fake, gc_real, pf_fake, pf_real], ignore_index=True)
+def analyze_in_memory(data_dir=DATA_DIR):
+    # 1. Load all four datasets and 2. combine
+    df = pd.concat([load_split(*split, data_dir) for split in SPLITS], ignore_index=True)
 
     print("=== BASIC INFO ===")
     print("Shape:", df.shape)
@@ -88,5 +97,195 @@ def main():
     print(df[df["label"] == "REAL"][["title", "source", "num_tweets"]].head(5))
 
 
+
+# --- Chunked mode: constant memory for multi-GB exports ---
+
+class ValueCountStats:
+    """
+    Streaming describe() for integer-valued columns. Keeps value -> count, so
+    memory depends on the number of distinct values (lengths, tweet counts),
+    not on rows, and the quartiles are exact.
+    """
+
+    def __init__(self):
+        self.counts = None
+
+    def update(self, values: pd.Series):
+        counts = values.dropna().value_counts()
+        self.counts = counts if self.counts is None else self.counts.add(counts, fill_value=0).astype("int64")
+
+    def describe(self) -> dict:
+        if self.counts is None:
+            return {"count": 0}
+        counts = self.counts[self.counts > 0].sort_index()
+        n = int(counts.sum())
+        if n == 0:
+            return {"count": 0}
+        values = counts.index.to_numpy(dtype=float)
+        weights = counts.to_numpy(dtype=float)
+        mean = float((values * weights).sum() / n)
+        var = float((weights * (values - mean) ** 2).sum() / (n - 1)) if n > 1 else float("nan")
+        cumulative = np.cumsum(weights)
+
+        def quantile(q):
+            # Same linear interpolation as pandas: position q * (n - 1) in the sorted values.
+            pos = q * (n - 1)
+            lo, hi = int(np.floor(pos)), int(np.ceil(pos))
+            v_lo = values[np.searchsorted(cumulative, lo + 1)]
+            v_hi = values[np.searchsorted(cumulative, hi + 1)]
+            return float(v_lo + (v_hi - v_lo) * (pos - lo))
+
+        return {
+            "count": n, "mean": mean, "std": float(np.sqrt(var)), "min": float(values[0]),
+            "25%": quantile(0.25), "50%": quantile(0.5), "75%": quantile(0.75), "max": float(values[-1]),
+        }
+
+
+def hash_keys(values: pd.Series) -> np.ndarray:
+    """64-bit hashes of the non-empty values; rows are compared by hash, not by text."""
+    return pd.util.hash_pandas_object(values.dropna().astype(str), index=False).to_numpy()
+
+
+def merge_counts(counted, values):
+    """Fold `values` into a sorted (unique, counts) pair; memory grows with the distinct values only."""
+    unique, counts = np.unique(values, return_counts=True)
+    if counted is None:
+        return unique, counts
+    # Both sides are sorted and unique: bump the keys we already have, then
+    # insert the new ones in place, without re-sorting the accumulated keys.
+    seen, seen_counts = counted[0], counted[1].copy()
+    pos = np.searchsorted(seen, unique)
+    found = pos < len(seen)
+    found[found] = seen[pos[found]] == unique[found]
+    seen_counts[pos[found]] += counts[found]
+    return np.insert(seen, pos[~found], unique[~found]), np.insert(seen_counts, pos[~found], counts[~found])
+
+
+def iter_split_chunks(data_dir, chunk_size, columns=None):
+    for filename, label, source in SPLITS:
+        for chunk in pd.read_csv(Path(data_dir) / filename, chunksize=chunk_size, usecols=columns):
+            chunk["label"] = label
+            chunk["source"] = source
+            yield chunk
+
+
+def duplicate_examples(data_dir, chunk_size, key, dup_hashes, limit=NUM_EXAMPLES):
+    """Second pass over just the key column, stopping after `limit` example rows."""
+    examples = []
+    if len(dup_hashes) == 0:
+        return examples
+    for chunk in iter_split_chunks(data_dir, chunk_size, columns=[key]):
+        chunk = chunk.dropna(subset=[key])
+        mask = np.isin(hash_keys(chunk[key]), dup_hashes)
+        examples.extend(chunk.loc[mask, [key, "source", "label"]].to_dict("records"))
+        if len(examples) >= limit:
+            break
+    return examples[:limit]
+
+
+def analyze_chunked(data_dir=DATA_DIR, chunk_size=CHUNK_SIZE):
+    """
+    Same audit as the in-memory mode, one chunk at a time. Returns the report dict.
+
+    Memory does not grow with the row count, except for duplicate detection:
+    each chunk's key hashes are merged into one sorted (hash, count) array per
+    key, so that part is O(distinct keys), 16 bytes each.
+    """
+    rows = 0
+    missing = group_counts = None
+    stats = {}
+    hash_counts = dict.fromkeys(DUPLICATE_KEYS)
+
+    def update(metric, by, chunk):
+        for group, values in chunk.groupby(by)[metric]:
+            stats.setdefault((metric, by, group), ValueCountStats()).update(values)
+
+    for chunk in iter_split_chunks(data_dir, chunk_size):
+        rows += len(chunk)
+        chunk_missing = chunk.isna().sum()
+        chunk_groups = chunk.groupby(["source", "label"]).size()
+        missing = chunk_missing if missing is None else missing.add(chunk_missing, fill_value=0)
+        group_counts = chunk_groups if group_counts is None else group_counts.add(chunk_groups, fill_value=0)
+        add_length_columns(chunk)
+        for metric in ("title_char_len", "title_word_len"):
+            update(metric, "label", chunk)
+        for by in ("source", "label"):
+            update("num_tweets", by, chunk)
+        for key in DUPLICATE_KEYS:
+            hash_counts[key] = merge_counts(hash_counts[key], hash_keys(chunk[key]))
+        print(f"[INFO] Processed {rows} rows")
+
+    if rows == 0:
+        raise ValueError(f"No rows found in {data_dir}")
+
+    duplicates = {}
+    for key in DUPLICATE_KEYS:
+        unique, counts = hash_counts[key]
+        dup_hashes = unique[counts > 1]
+        duplicates[key] = {
+            "duplicate_groups": int(len(dup_hashes)),
+            "rows_in_duplicate_groups": int(counts[counts > 1].sum()),
+            "examples": duplicate_examples(data_dir, chunk_size, key, dup_hashes),
+        }
+
+    describe = {}
+    for (metric, by, group), s in sorted(stats.items()):
+        describe.setdefault(metric, {}).setdefault(f"by_{by}", {})[group] = s.describe()
+
+    return {
+        "rows": rows,
+        "counts": {
+            "by_label": group_counts.groupby(level=1).sum().astype(int).to_dict(),
+            "by_source": group_counts.groupby(level=0).sum().astype(int).to_dict(),
+            "by_source_label": {f"{s}/{l}": int(c) for (s, l), c in group_counts.items()},
+        },
+        "missing_fraction": (missing / rows).to_dict(),
+        "describe": describe,
+        "duplicates": duplicates,
+    }
+
+
+def _flatten(data, prefix=""):
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, path + ".")
+        elif isinstance(value, (int, float)):
+            yield path, float(value)
+
+
+def write_report(report, path):
+    """JSON keeps the full report; Parquet gets one (metric, value) row per number."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    if str(path).endswith(".parquet"):
+        pd.DataFrame(list(_flatten(report)), columns=["metric", "value"]).to_parquet(path, index=False)
+    else:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+    print(f"[INFO] Wrote report to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit the FakeNewsNet CSVs.")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--chunked", action="store_true",
+                        help="stream the CSVs in chunks (memory bounded by distinct keys, not rows) and write a report")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--report", default=REPORT_PATH, help="chunked-mode report (.json or .parquet)")
+    args = parser.parse_args()
+
+    if not args.chunked:
+        analyze_in_memory(args.data_dir)
+        return
+
+    report = analyze_chunked(args.data_dir, args.chunk_size)
+    print(f"\n=== {report['rows']} rows ===")
+    print("Counts by label:", report["counts"]["by_label"])
+    print("Counts by source:", report["counts"]["by_source"])
+    for key, d in report["duplicates"].items():
+        print(f"Duplicates by {key}: {d['duplicate_groups']} groups, {d['rows_in_duplicate_groups']} rows")
+    write_report(report, args.report)
+
+
 if __name__ == "__main__":
     main()
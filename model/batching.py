@@ -0,0 +1,97 @@
+import os
+import threading
+import queue
+import time
+from concurrent.futures import Future
+
+try:
+    from model.instrumentation import collect_stages, report_to_caller
+except ImportError:  # running from inside model/
+    from instrumentation import collect_stages, report_to_caller
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-item requests for a short window and runs
+    them through `batch_fn` as one batch.
+
+    `batch_fn(items)` must return one result per item, in the same order.
+    Each caller gets its own result (or exception) back through a Future.
+
+    The worker thread is started on first use (and restarted in a forked
+    child), so a batcher created before a pre-fork server forks still works.
+
+    The instrumentation stages of a batch (plus each item's `batch_wait` in
+    the queue) travel back on the futures; __call__ reports them to the
+    caller observers, so per-request timings include them.
+    """
+
+    def __init__(self, batch_fn, window_ms=5.0, max_batch_size=32):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                worker = threading.Thread(target=self._run, args=(self._queue,), name="micro-batcher", daemon=True)
+                worker.start()
+                self._pid = os.getpid()
+
+    def submit(self, item) -> Future:
+        self._ensure_worker()
+        future = Future()
+        future.submitted = time.perf_counter()
+        future.stages = []
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item, timeout=None):
+        future = self.submit(item)
+        try:
+            return future.result(timeout=timeout)
+        finally:
+            report_to_caller(future.stages)
+
+    def _collect(self, q):
+        # Block for the first item, then keep draining until the window
+        # closes or the batch is full.
+        batch = [q.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, q):
+        while True:
+            batch = self._collect(q)
+            items = [item for item, _ in batch]
+            started = time.perf_counter()
+            error = None
+            with collect_stages() as stages:
+                try:
+                    results = self.batch_fn(items)
+                except Exception as e:
+                    error = e
+
+            for _, future in batch:
+                future.stages = [("batch_wait", started - future.submitted)] + stages
+            if error is not None:
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
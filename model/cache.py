@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def normalize_text(text: str) -> str:
+    """Lower-case and collapse whitespace (the classifier is uncased)."""
+    return " ".join(text.lower().split())
+
+
+def model_fingerprint(model_path: str) -> str:
+    """
+    Hash of the file names, sizes and mtimes in `model_path`.
+    Changes whenever the saved model is retrained or replaced.
+    """
+    h = hashlib.sha1()
+    if os.path.isdir(model_path):
+        for name in sorted(os.listdir(model_path)):
+            stat = os.stat(os.path.join(model_path, name))
+            h.update(f"{name}:{stat.st_size}:{int(stat.st_mtime)};".encode())
+    return h.hexdigest()[:16]
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache with a TTL, keyed on a hash of the normalized text.
+
+    If `db_path` is set, entries are also written to a sqlite file so they
+    survive restarts. Entries stored under a different `version` (model
+    fingerprint) are dropped when the cache is opened. The file can be
+    shared by several worker processes (WAL mode); a sqlite error (e.g. a
+    lock timeout) counts as a miss or a skipped write, never as a failure.
+    The table is pruned to the newest `max_size` entries per namespace.
+    Values must be JSON-serializable.
+    """
+
+    PRUNE_EVERY = 100  # sqlite writes between prunes
+
+    def __init__(self, namespace, max_size=10000, ttl=3600.0, db_path=None, version=""):
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_path = db_path
+        self._db_conn = None
+        self._db_pid = None
+        self._writes = 0
+        if db_path:
+            self._open_db()
+
+    @property
+    def _db(self):
+        # sqlite connections must not be shared across fork; reopen in children.
+        if self._db_path and self._db_pid != os.getpid():
+            self._db_conn = sqlite3.connect(self._db_path, timeout=5, check_same_thread=False)
+            self._db_conn.execute("PRAGMA journal_mode=WAL")
+            self._db_pid = os.getpid()
+        return self._db_conn
+
+    def _open_db(self):
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT, key TEXT, value TEXT, created REAL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_created ON cache (namespace, created)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache_version (namespace TEXT PRIMARY KEY, version TEXT)"
+        )
+        row = self._db.execute(
+            "SELECT version FROM cache_version WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        if row is None or row[0] != self.version:
+            self._db.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache_version (namespace, version) VALUES (?, ?)",
+                (self.namespace, self.version),
+            )
+        self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+    def get(self, text: str):
+        if not self.enabled:
+            return None
+        key = self.key(text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+
+            if entry is None and self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, created FROM cache WHERE namespace = ? AND key = ?",
+                        (self.namespace, key),
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"[WARN] {self.namespace} cache read failed: {e}")
+                    row = None
+                if row is not None and now - row[1] <= self.ttl:
+                    entry = (json.loads(row[0]), row[1])
+                    self._remember(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, text: str, value):
+        if not self.enabled:
+            return
+        key = self.key(text)
+        entry = (value, time.time())
+
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, created) VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value), entry[1]),
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune(entry[1])
+                self._db.commit()
+            except sqlite3.Error as e:
+                # The in-memory entry is enough; a busy or broken file must not fail the request.
+                print(f"[WARN] {self.namespace} cache write failed: {e}")
+                self._db.rollback()
+
+    def _prune(self, now):
+        """Drop expired rows and everything beyond the newest max_size."""
+        self._db.execute(
+            "DELETE FROM cache WHERE namespace = ? AND created < ?", (self.namespace, now - self.ttl)
+        )
+        self._db.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN ("
+            "SELECT key FROM cache WHERE namespace = ? ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_size),
+        )
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry (memory and sqlite) and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+                self._db.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -1,6 +1,9 @@
 import os
+import time
+import argparse
 import torch
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from sklearn.metrics import accuracy_score, f1_score
 
@@ -10,56 +13,128 @@ TEST_CSV_PATH   = "data/manual_test.csv"
 TEXT_COL        = "text"
 LABEL_COL       = "label"
 BASE_MODEL      = "distilbert-base-uncased"   # tokenizer source
+MAX_LENGTH      = 512                         # DistilBERT's limit (same as truncation=True)
+BATCH_SIZE      = 32
+RESULTS_PATH    = "model_output/checkpoint_results.csv"
 # ====================
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-print(f"[INFO] Using device: {device}")
 
-# Load test dataset
-df = pd.read_csv(TEST_CSV_PATH)
-texts = df[TEXT_COL].astype(str).tolist()
-labels = df[LABEL_COL].tolist()
-print(f"[INFO] Loaded {len(df)} test samples")
+def find_checkpoints(root):
+    checkpoints = []
+    for name in os.listdir(root):
+        if name.startswith("checkpoint-"):
+            step = int(name.split("-")[-1])
+            checkpoints.append((step, os.path.join(root, name)))
+    return sorted(checkpoints)
 
-# Find checkpoints
-checkpoints = []
-for name in os.listdir(CHECKPOINT_ROOT):
-    if name.startswith("checkpoint-"):
-        step = int(name.split("-")[-1])
-        checkpoints.append((step, os.path.join(CHECKPOINT_ROOT, name)))
 
-checkpoints = sorted(checkpoints)
-print("[INFO] Found checkpoints:")
-for step, path in checkpoints:
-    print(f"  - {path} (step {step})")
+def build_batches(tokenizer, texts, batch_size):
+    """
+    Tokenize the test set once and group it into length-bucketed, padded
+    batches. Returns [(indices, encoding)], reused for every checkpoint.
+    """
+    encodings = tokenizer(texts, truncation=True, max_length=MAX_LENGTH)["input_ids"]
+    order = sorted(range(len(texts)), key=lambda i: len(encodings[i]))
 
-# Load tokenizer from base model (NOT checkpoint)
-tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL)
+    batches = []
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        padded = tokenizer.pad({"input_ids": [encodings[i] for i in indices]}, return_tensors="pt")
+        batches.append((indices, dict(padded)))
+    return batches
 
-results = []
 
-for step, ckpt_path in checkpoints:
-    print(f"\n[INFO] Evaluating {ckpt_path} ...")
+def evaluate_checkpoint(step, ckpt_path, batches, labels, device="cpu", num_threads=0):
+    if num_threads:
+        torch.set_num_threads(num_threads)
 
     model = AutoModelForSequenceClassification.from_pretrained(ckpt_path)
     model.to(device)
     model.eval()
 
-    preds = []
-
+    preds = [None] * len(labels)
+    start = time.perf_counter()
     with torch.no_grad():
-        for text in texts:
-            enc = tokenizer(text, return_tensors="pt", truncation=True).to(device)
-            out = model(**enc)
-            pred = torch.argmax(out.logits).item()
-            preds.append(pred)
+        for indices, enc in batches:
+            out = model(**{k: v.to(device) for k, v in enc.items()})
+            for i, pred in zip(indices, out.logits.argmax(dim=-1).tolist()):
+                preds[i] = pred
+    elapsed = time.perf_counter() - start
+
+    return {
+        "step": step,
+        "checkpoint": ckpt_path,
+        "acc": accuracy_score(labels, preds),
+        "f1": f1_score(labels, preds, average="weighted"),
+        "latency_ms_per_sample": 1000 * elapsed / len(labels),
+    }
+
+
+def write_results(results, path):
+    df = pd.DataFrame(results).sort_values("step")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith(".json"):
+        df.to_json(path, orient="records", indent=2)
+    else:
+        df.to_csv(path, index=False)
+    print(f"[INFO] Wrote results to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate every checkpoint-* on the test set.")
+    parser.add_argument("--checkpoint-root", default=CHECKPOINT_ROOT)
+    parser.add_argument("--test-csv", default=TEST_CSV_PATH)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="evaluate this many checkpoints in parallel processes (CPU only)")
+    parser.add_argument("--out", default=RESULTS_PATH, help="results table (.csv or .json)")
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"[INFO] Using device: {device}")
+
+    # Load test dataset
+    df = pd.read_csv(args.test_csv)
+    texts = df[TEXT_COL].astype(str).tolist()
+    labels = df[LABEL_COL].tolist()
+    print(f"[INFO] Loaded {len(df)} test samples")
+
+    checkpoints = find_checkpoints(args.checkpoint_root)
+    print("[INFO] Found checkpoints:")
+    for step, path in checkpoints:
+        print(f"  - {path} (step {step})")
+
+    # Load tokenizer from base model (NOT checkpoint)
+    tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL)
+    batches = build_batches(tokenizer, texts, args.batch_size)
+
+    results = []
+    if args.workers > 1 and device.type == "cpu":
+        # Split cores between workers so they don't oversubscribe the CPU.
+        threads = max(1, (os.cpu_count() or 1) // args.workers)
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [
+                pool.submit(evaluate_checkpoint, step, path, batches, labels, "cpu", threads)
+                for step, path in checkpoints
+            ]
+            for future in futures:
+                r = future.result()
+                print(f"[RESULT] step {r['step']}: acc={r['acc']:.4f}, f1={r['f1']:.4f}")
+                results.append(r)
+    else:
+        for step, path in checkpoints:
+            print(f"\n[INFO] Evaluating {path} ...")
+            r = evaluate_checkpoint(step, path, batches, labels, device)
+            print(f"[RESULT] step {step}: acc={r['acc']:.4f}, f1={r['f1']:.4f}")
+            results.append(r)
+
+    print("\n=== SUMMARY ===")
+    for r in sorted(results, key=lambda r: r["step"]):
+        print(f"step {r['step']}: acc={r['acc']:.4f}, f1={r['f1']:.4f}, "
+              f"latency={r['latency_ms_per_sample']:.2f} ms/sample")
 
-    acc = accuracy_score(labels, preds)
-    f1 = f1_score(labels, preds, average="weighted")
+    write_results(results, args.out)
 
-    print(f"[RESULT] step {step}: acc={acc:.4f}, f1={f1:.4f}")
-    results.append((step, acc, f1))
 
-print("\n=== SUMMARY ===")
-for step, acc, f1 in results:
-    print(f"step {step}: acc={acc:.4f}, f1={f1:.4f}")
+if __name__ == "__main__":
+    main()
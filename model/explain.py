@@ -0,0 +1,212 @@
+"""
+Token attributions computed in the same forward pass as the prediction.
+
+Methods:
+    attention   Attention rollout over all layers. Uses the attentions of the
+                prediction forward itself, so it costs about one plain
+                prediction (well under 1.5x). This is the default.
+    gradxinput  Gradient x input on the embeddings. Adds one backward pass
+                (roughly 2-3x a plain prediction) but is more faithful.
+
+Wordpieces are merged back into the words of the original text using the
+tokenizer's offsets. Long texts (see PREDICT_LONG_DOC in predict.py) are
+explained on their first window, but their label and probabilities come from
+the sliding-window aggregate over the whole text; the first window's forward
+is shared by both. With KEYWORD_BACKEND=classifier, the same forward's last
+hidden states also give the keyphrases for the social-context search term.
+Explanations run on the backend selected by PREDICT_BACKEND. The ONNX model
+exports the attentions and hidden states for this (model/export_onnx.py);
+gradxinput needs gradients, so it requires the torch backend.
+"""
+import os
+import torch
+import torch.nn.functional as F
+
+try:
+    from model.batching import MicroBatcher
+    from model.instrumentation import stage, record_batch
+    from model.keywords import STOP_WORDS, KEYWORD_BACKEND, SHORT_TEXT_WORDS, classifier_keyphrases
+    from model.predict import (
+        get_tokenizer, get_torch_model, get_onnx_session, is_long, tokenize_windows, window_logits,
+        aggregate_windows, BACKEND, LABELS, MAX_LENGTH, MAX_WINDOWS, LONG_DOC_AGGREGATION,
+        BATCH_WINDOW_MS, MAX_BATCH_SIZE,
+    )
+except ImportError:  # running from inside model/
+    from batching import MicroBatcher
+    from instrumentation import stage, record_batch
+    from keywords import STOP_WORDS, KEYWORD_BACKEND, SHORT_TEXT_WORDS, classifier_keyphrases
+    from predict import (
+        get_tokenizer, get_torch_model, get_onnx_session, is_long, tokenize_windows, window_logits,
+        aggregate_windows, BACKEND, LABELS, MAX_LENGTH, MAX_WINDOWS, LONG_DOC_AGGREGATION,
+        BATCH_WINDOW_MS, MAX_BATCH_SIZE,
+    )
+
+EXPLAIN_METHOD = os.getenv("EXPLAIN_METHOD", "attention")
+TOP_K = 8
+METHOD_NAMES = {"attention": "attention_rollout_v1", "gradxinput": "grad_x_input_v1"}
+ONNX_OUTPUTS = ["logits", "attentions", "last_hidden_state"]
+
+if BACKEND == "onnx" and EXPLAIN_METHOD == "gradxinput":
+    raise ValueError("EXPLAIN_METHOD=gradxinput needs gradients and is not available with PREDICT_BACKEND=onnx")
+
+
+def _rollout(attentions, attention_mask):
+    """
+    Attention rollout (Abnar & Zuidema): CLS row of the product of per-layer
+    maps. `attentions` are the head-averaged [batch, seq, seq] maps per layer.
+    """
+    mask = attention_mask.unsqueeze(1).float()
+    seq_len = attention_mask.shape[1]
+    eye = torch.eye(seq_len, device=attention_mask.device).unsqueeze(0)
+    rollout = eye
+    for layer in attentions:
+        a = layer * mask                          # drop padding columns
+        a = 0.5 * a + 0.5 * eye                   # account for residual connections
+        a = a / a.sum(dim=-1, keepdim=True)
+        rollout = torch.bmm(a, rollout)
+    return rollout[:, 0, :]
+
+
+def _onnx_forward_with_scores(inputs):
+    session = get_onnx_session()
+    if not set(ONNX_OUTPUTS) <= {output.name for output in session.get_outputs()}:
+        raise RuntimeError("The ONNX model has no explanation outputs. Re-run: python model/export_onnx.py")
+    feeds = {
+        "input_ids": inputs["input_ids"].numpy(),
+        "attention_mask": inputs["attention_mask"].numpy(),
+    }
+    logits, attentions, hidden = (torch.from_numpy(out) for out in session.run(ONNX_OUTPUTS, feeds))
+    scores = _rollout(attentions.float(), inputs["attention_mask"])
+    return logits.float(), scores, hidden.float()
+
+
+def _forward_with_scores(inputs, method):
+    """Returns (logits, per-token scores, last hidden states) for the batch."""
+    if BACKEND == "onnx":
+        return _onnx_forward_with_scores(inputs)
+
+    model = get_torch_model()
+    if method == "gradxinput":
+        embeds = model.get_input_embeddings()(inputs["input_ids"]).detach().requires_grad_(True)
+        with torch.enable_grad():
+            outputs = model(inputs_embeds=embeds, attention_mask=inputs["attention_mask"], output_hidden_states=True)
+            logits = outputs.logits
+            pred = logits.argmax(dim=1)
+            # Samples are independent, so one backward on the sum gives every row its own
+            # gradient. autograd.grad leaves the model's parameter .grad untouched.
+            (grads,) = torch.autograd.grad(logits.gather(1, pred.unsqueeze(1)).sum(), embeds)
+        scores = (grads * embeds).sum(dim=-1).abs().detach()
+        return logits.detach(), scores, outputs.hidden_states[-1].detach()
+
+    with torch.no_grad():
+        outputs = model(**inputs, output_attentions=True, output_hidden_states=True)
+    scores = _rollout([layer.mean(dim=1) for layer in outputs.attentions], inputs["attention_mask"])
+    return outputs.logits, scores, outputs.hidden_states[-1]
+
+
+def _merge_words(text, encoding, scores, top_k):
+    """Sum wordpiece scores per word and return the top words as (span, score)."""
+    words = {}
+    for token_idx, word_idx in enumerate(encoding.word_ids):
+        if word_idx is None:
+            continue  # [CLS], [SEP], padding
+        start, end = encoding.offsets[token_idx]
+        span, score = words.get(word_idx, (None, 0.0))
+        span = (start, end) if span is None else (span[0], end)
+        words[word_idx] = (span, score + scores[token_idx])
+
+    best = {}
+    for (start, end), score in words.values():
+        word = text[start:end]
+        key = word.lower()
+        if not any(c.isalnum() for c in word) or key in STOP_WORDS:
+            continue
+        if score > best.get(key, (None, -1.0))[1]:
+            best[key] = (word, score)
+
+    ranked = sorted(best.values(), key=lambda item: item[1], reverse=True)[:top_k]
+    top = ranked[0][1] if ranked and ranked[0][1] > 0 else 1.0
+    return [(word, round(score / top, 4)) for word, score in ranked]
+
+
+def explain_batch(texts, method=None, top_k=TOP_K):
+    """
+    Predict and explain `texts` in one padded forward.
+    Returns [(label, confidence, probs, highlights, keyphrases)], highlights
+    being [(word, score in 0..1)] sorted by importance. keyphrases are the
+    classifier-backend keyphrases for build_search_term, or None for short
+    texts and other keyword backends.
+    """
+    method = method or EXPLAIN_METHOD
+    if method not in METHOD_NAMES:
+        raise ValueError(f"Unknown explanation method '{method}' (expected one of {sorted(METHOD_NAMES)})")
+    if BACKEND == "onnx" and method == "gradxinput":
+        raise ValueError("The gradxinput explanation method requires PREDICT_BACKEND=torch")
+
+    record_batch("explain", len(texts))
+    long_idx = [i for i, text in enumerate(texts) if is_long(text)]
+    with stage("tokenize"):
+        if long_idx:
+            encoded, doc_ids, ranks = tokenize_windows(texts, return_offsets_mapping=True)
+        else:
+            encoded = get_tokenizer()(
+                list(texts), return_tensors="pt", truncation=True, padding=True,
+                max_length=MAX_LENGTH, return_offsets_mapping=True,
+            )
+            doc_ids, ranks = torch.arange(len(texts)), torch.zeros(len(texts), dtype=torch.long)
+        encoded.pop("offset_mapping")
+        first = (ranks == 0).nonzero().squeeze(1)  # each text's first window, in text order
+        encodings = [encoded.encodings[row] for row in first.tolist()]
+
+    with stage("forward"):
+        # First windows only need padding to their own longest row, not to the longest window.
+        width = int(encoded["attention_mask"][first].sum(dim=1).max())
+        logits, scores, hidden = _forward_with_scores({k: v[first, :width] for k, v in encoded.items()}, method)
+        probs = F.softmax(logits.float(), dim=1)
+        if long_idx:
+            # The verdict for long texts covers every window. The first window
+            # comes from the forward above; only the others run here.
+            long_docs = torch.tensor(long_idx)
+            is_long_doc = torch.zeros(len(texts), dtype=torch.bool)
+            is_long_doc[long_docs] = True
+            rest = ((ranks > 0) & (ranks < MAX_WINDOWS) & is_long_doc[doc_ids]).nonzero().squeeze(1)
+            window_doc_ids, all_logits = long_docs, logits.float()[long_docs]
+            if len(rest):
+                record_batch("explain_windows", len(rest))
+                window_doc_ids = torch.cat([long_docs, doc_ids[rest]])
+                all_logits = torch.cat([all_logits, window_logits({k: v[rest] for k, v in encoded.items()})])
+            aggregated = aggregate_windows(all_logits, window_doc_ids, len(texts), LONG_DOC_AGGREGATION)
+            probs[long_docs] = aggregated[long_docs]
+
+    results = []
+    with stage("highlights"):
+        confidences, pred_classes = probs.max(dim=1)
+        for i, text in enumerate(texts):
+            highlights = _merge_words(text, encodings[i], scores[i].tolist(), top_k)
+            keyphrases = None
+            if KEYWORD_BACKEND == "classifier" and len(text.split()) > SHORT_TEXT_WORDS:
+                keyphrases = classifier_keyphrases(text, encodings[i], hidden[i])
+            results.append((LABELS[pred_classes[i].item()], confidences[i].item(), probs[i].tolist(),
+                            highlights, keyphrases))
+    return results
+
+
+_batcher = None
+
+
+def enable_batching(window_ms=None, max_batch_size=None):
+    """Micro-batch concurrent predict_explain calls that use the default settings."""
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher(
+            explain_batch,
+            window_ms=BATCH_WINDOW_MS if window_ms is None else window_ms,
+            max_batch_size=MAX_BATCH_SIZE if max_batch_size is None else max_batch_size,
+        )
+    return _batcher
+
+
+def predict_explain(text, method=None, top_k=TOP_K):
+    if _batcher is not None and method in (None, EXPLAIN_METHOD) and top_k == TOP_K:
+        return _batcher(text)
+    return explain_batch([text], method, top_k)[0]
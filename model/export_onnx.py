@@ -0,0 +1,87 @@
+"""
+Export model/bert_fakenews to ONNX and apply dynamic INT8 quantization.
+
+Run from the project root:
+    python model/export_onnx.py
+
+Then serve with PREDICT_BACKEND=onnx.
+
+Besides the logits, the graph outputs what /predict_explain needs, so
+explanations run on ONNX too: the head-averaged attentions of every layer
+(for attention rollout) and the last hidden states (for classifier
+keyphrases). Plain predictions only fetch the logits.
+"""
+import os
+import argparse
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+MODEL_PATH = "model/bert_fakenews"
+OUTPUT_DIR = "model/bert_fakenews_onnx"
+OPSET = 14
+OUTPUT_NAMES = ["logits", "attentions", "last_hidden_state"]
+
+
+class ExplainOutputs(torch.nn.Module):
+    """Returns (logits, [layers, batch, seq, seq] head-averaged attentions, last hidden states)."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        outputs = self.model(
+            input_ids=input_ids, attention_mask=attention_mask,
+            output_attentions=True, output_hidden_states=True, return_dict=True,
+        )
+        attentions = torch.stack([layer.mean(dim=1) for layer in outputs.attentions])
+        return outputs.logits, attentions, outputs.hidden_states[-1]
+
+
+def export(model_path=MODEL_PATH, output_dir=OUTPUT_DIR, opset=OPSET):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    int8_path = os.path.join(output_dir, "model.int8.onnx")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    # Eager attention, so the attention probabilities are materialized and exportable.
+    model = AutoModelForSequenceClassification.from_pretrained(model_path, attn_implementation="eager")
+    model.eval()
+
+    dummy = tokenizer(["dummy headline for export"], return_tensors="pt")
+
+    print(f"[INFO] Exporting {model_path} -> {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            ExplainOutputs(model),
+            (dummy["input_ids"], dummy["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=OUTPUT_NAMES,
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+                "attentions": {1: "batch", 2: "sequence", 3: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=opset,
+        )
+
+    print(f"[INFO] Quantizing (dynamic INT8) -> {int8_path}")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    for path in (fp32_path, int8_path):
+        print(f"  - {path}: {os.path.getsize(path) / 1e6:.1f} MB")
+    return int8_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--opset", type=int, default=OPSET)
+    args = parser.parse_args()
+    export(args.model_path, args.output_dir, args.opset)
@@ -0,0 +1,73 @@
+"""
+Lightweight hooks for timing inference stages.
+
+The model code reports stage durations and batch sizes here; whoever serves
+it (e.g. ml-service's Prometheus metrics) registers observers. With no
+observers registered the overhead is one perf_counter pair per stage.
+
+Stages that run in a MicroBatcher worker on behalf of callers are collected
+there and handed back to every caller in the batch, which passes them to the
+caller observers in its own context (e.g. for a per-request Server-Timing).
+"""
+import time
+import contextvars
+from contextlib import contextmanager
+
+_stage_observers = []
+_batch_observers = []
+_caller_observers = []
+
+# List that stage() also appends to, while a collect_stages() block is active.
+_collected = contextvars.ContextVar("collected_stages", default=None)
+
+
+def add_stage_observer(fn):
+    """fn(stage: str, seconds: float)"""
+    _stage_observers.append(fn)
+
+
+def add_batch_observer(fn):
+    """fn(kind: str, size: int)"""
+    _batch_observers.append(fn)
+
+
+def add_caller_observer(fn):
+    """fn(stage: str, seconds: float), for stages another thread ran on the caller's behalf."""
+    _caller_observers.append(fn)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for fn in _stage_observers:
+            fn(name, elapsed)
+        collected = _collected.get()
+        if collected is not None:
+            collected.append((name, elapsed))
+
+
+@contextmanager
+def collect_stages():
+    """Yields a list of the (stage, seconds) that run inside the block."""
+    collected = []
+    token = _collected.set(collected)
+    try:
+        yield collected
+    finally:
+        _collected.reset(token)
+
+
+def report_to_caller(stages):
+    """Pass stages collected elsewhere to the caller observers, in the caller's context."""
+    for name, seconds in stages:
+        for fn in _caller_observers:
+            fn(name, seconds)
+
+
+def record_batch(kind, size):
+    for fn in _batch_observers:
+        fn(kind, size)
@@ -0,0 +1,299 @@
+"""
+Search-term building for social-context lookups, shared by app.py,
+web_app.py and the ML service.
+
+Backends (KEYWORD_BACKEND):
+    classifier  Scores 1-2 word candidates by the cosine similarity of their
+                pooled last-layer states to the pooled document, using the
+                hidden states of the classifier forward. When the prediction
+                already ran (explain.py), this costs no extra forward and no
+                extra model. Default. Callers without that forward use
+                lexical instead (standalone_backend).
+    lexical     TF-IDF-style scoring of 1-2 word phrases against a precomputed
+                IDF table. No model, runs in well under a millisecond.
+    keybert     The original KeyBERT extraction. Loads a second
+                (sentence-transformers) model, so only use it when asked for.
+
+Short inputs (<= 12 words) are used as-is. Results are cached per text.
+
+Build the IDF table from the training CSVs (run from the project root):
+    python model/keywords.py build-idf --data-dir data
+"""
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter
+
+try:
+    from model.cache import PredictionCache
+except ImportError:  # running from inside model/
+    from cache import PredictionCache
+
+KEYWORD_BACKEND = os.getenv("KEYWORD_BACKEND", "classifier")
+IDF_PATH = os.getenv("KEYWORD_IDF_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "idf_table.json"))
+SHORT_TEXT_WORDS = 12
+TOP_N = 3
+BACKENDS = ("classifier", "lexical", "keybert")
+
+STOP_WORDS = set("""
+a about after again against all also am an and any are as at be because been before being
+between both but by can could did do does doing down during each few for from further had
+has have having he her here hers him his how i if in into is it its itself just me more most
+my no nor not now of off on once only or other our out over own same she should so some such
+than that the their them then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your
+""".split())
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+
+_caches = {backend: PredictionCache(f"keywords_{backend}", max_size=10000, ttl=24 * 3600) for backend in BACKENDS}
+
+
+# --- Lexical backend ---
+
+_idf = None
+_idf_lock = threading.Lock()
+
+
+def _load_idf():
+    """Returns (idf dict, idf for unseen words). Uniform weights if no table exists."""
+    global _idf
+    if _idf is None:
+        with _idf_lock:
+            if _idf is None:
+                if os.path.exists(IDF_PATH):
+                    with open(IDF_PATH) as f:
+                        table = json.load(f)
+                    _idf = (table["idf"], math.log((table["num_docs"] + 1) / 1) + 1)
+                else:
+                    _idf = ({}, 1.0)
+    return _idf
+
+
+def _tokenize(text):
+    return _WORD_RE.findall(text.lower())
+
+
+def _lexical_keyphrases(text, top_n=TOP_N):
+    idf, unseen_idf = _load_idf()
+    words = _tokenize(text)
+
+    candidates = Counter()
+    for i, word in enumerate(words):
+        if word in STOP_WORDS:
+            continue
+        candidates[(word,)] += 1
+        if i + 1 < len(words) and words[i + 1] not in STOP_WORDS:
+            candidates[(word, words[i + 1])] += 1
+
+    def score(phrase):
+        return candidates[phrase] * sum(idf.get(w, unseen_idf) for w in phrase)
+
+    ranked = sorted(candidates, key=score, reverse=True)
+    return [(" ".join(phrase), score(phrase)) for phrase in ranked[:top_n]]
+
+
+def build_idf_table(texts, path=IDF_PATH):
+    """Smoothed IDF over `texts` (one document each), written as JSON."""
+    doc_freq = Counter()
+    for text in texts:
+        doc_freq.update(set(_tokenize(str(text))))
+    num_docs = len(texts)
+    idf = {word: math.log((num_docs + 1) / (df + 1)) + 1 for word, df in doc_freq.items()}
+    with open(path, "w") as f:
+        json.dump({"num_docs": num_docs, "idf": idf}, f)
+    print(f"[INFO] Wrote IDF table for {len(idf)} words from {num_docs} documents to {path}")
+
+
+# --- Classifier backend ---
+
+def _is_candidate(word):
+    return any(c.isalnum() for c in word) and word.lower() not in STOP_WORDS
+
+
+def classifier_keyphrases(text, encoding, hidden, top_n=TOP_N):
+    """
+    Keyphrases of `text` from the classifier's last hidden states.
+    `encoding` is the tokenizer encoding of `text` (word_ids and offsets) and
+    `hidden` the matching [seq_len, dim] tensor. Candidates are single words
+    and adjacent word pairs; each is the mean of its wordpiece states and is
+    ranked by cosine similarity to the mean over all words, like KeyBERT.
+    """
+    import torch
+    import torch.nn.functional as F
+
+    spans = {}  # word index -> [first token, last token, char start, char end]
+    for token_idx, word_idx in enumerate(encoding.word_ids):
+        if word_idx is None:
+            continue  # [CLS], [SEP], padding
+        start, end = encoding.offsets[token_idx]
+        if word_idx in spans:
+            spans[word_idx][1], spans[word_idx][3] = token_idx, end
+        else:
+            spans[word_idx] = [token_idx, token_idx, start, end]
+    if not spans:
+        return []
+
+    order = sorted(spans)
+    words = [text[spans[w][2]:spans[w][3]] for w in order]
+    candidates = {}
+    for i, word in enumerate(words):
+        if not _is_candidate(word):
+            continue
+        candidates.setdefault(word.lower(), (spans[order[i]][0], spans[order[i]][1]))
+        if i + 1 < len(words) and _is_candidate(words[i + 1]):
+            phrase = f"{word} {words[i + 1]}".lower()
+            candidates.setdefault(phrase, (spans[order[i]][0], spans[order[i + 1]][1]))
+    if not candidates:
+        return []
+
+    hidden = hidden.detach().float()
+    first, last = spans[order[0]][0], spans[order[-1]][1]
+    doc = hidden[first:last + 1].mean(dim=0)
+    phrases = list(candidates)
+    pooled = torch.stack([hidden[a:b + 1].mean(dim=0) for a, b in candidates.values()])
+    scores = F.cosine_similarity(pooled, doc.unsqueeze(0), dim=1).tolist()
+
+    ranked = sorted(zip(phrases, scores), key=lambda item: item[1], reverse=True)
+    return ranked[:top_n]
+
+
+def _classifier_keyphrases_batch(texts, top_n=TOP_N):
+    """For callers without a forward of their own: one hidden-state forward of the classifier."""
+    try:
+        from model.predict import get_tokenizer, last_hidden_states, MAX_LENGTH
+    except ImportError:
+        from predict import get_tokenizer, last_hidden_states, MAX_LENGTH
+
+    inputs = get_tokenizer()(
+        list(texts), return_tensors="pt", truncation=True, padding=True, max_length=MAX_LENGTH,
+    )
+    last = last_hidden_states(inputs)
+    return [classifier_keyphrases(text, inputs.encodings[i], last[i], top_n) for i, text in enumerate(texts)]
+
+
+# --- KeyBERT backend (lazy) ---
+
+_kw_model = None
+_kw_model_failed = False
+_kw_model_lock = threading.Lock()
+
+
+def get_kw_model():
+    global _kw_model, _kw_model_failed
+    if _kw_model is None and not _kw_model_failed:
+        with _kw_model_lock:
+            if _kw_model is None and not _kw_model_failed:
+                try:
+                    from keybert import KeyBERT
+                    _kw_model = KeyBERT()
+                except Exception as e:
+                    print(f"Warning: KeyBERT failed to initialize: {e}")
+                    _kw_model_failed = True
+    return _kw_model
+
+
+def _keybert_keyphrases_batch(texts, top_n=TOP_N):
+    kw_model = get_kw_model()
+    if kw_model is None:
+        return [_lexical_keyphrases(text, top_n) for text in texts]
+
+    # Passing all docs at once embeds them in one batch.
+    keywords = kw_model.extract_keywords(
+        texts,
+        keyphrase_ngram_range=(1, 2),
+        stop_words="english",
+        top_n=top_n,
+    )
+    # KeyBERT returns a flat list for a single document.
+    return [keywords] if len(texts) == 1 else keywords
+
+
+# --- Search terms ---
+
+def _join_keyphrases(keywords):
+    keyphrases = [kw for kw, _ in keywords if len(kw.split()) > 1]
+    if not keyphrases:
+        keyphrases = [kw for kw, _ in keywords]
+
+    return " ".join(keyphrases)
+
+
+def build_search_terms(texts, backend=None, keyphrases=None):
+    """
+    Search terms for several texts; model backends embed all uncached texts
+    together. `keyphrases` (one list per text, e.g. from explain_batch) are
+    used directly instead of running the backend.
+    """
+    backend = backend or KEYWORD_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown keyword backend '{backend}' (expected one of {BACKENDS})")
+    cache = _caches[backend]
+
+    terms = [None] * len(texts)
+    pending = []
+    for i, text in enumerate(texts):
+        # For short headlines, just use the full text
+        if len(text.split()) <= SHORT_TEXT_WORDS:
+            terms[i] = text
+            continue
+        if keyphrases is not None and keyphrases[i] is not None:
+            terms[i] = _join_keyphrases(keyphrases[i]) or text
+            cache.set(text, terms[i])
+            continue
+        cached = cache.get(text)
+        if cached is not None:
+            terms[i] = cached
+        else:
+            pending.append(i)
+
+    if pending:
+        pending_texts = [texts[i] for i in pending]
+        if backend == "keybert":
+            keywords = _keybert_keyphrases_batch(pending_texts)
+        elif backend == "classifier":
+            keywords = _classifier_keyphrases_batch(pending_texts)
+        else:
+            keywords = [_lexical_keyphrases(text) for text in pending_texts]
+        for i, kws in zip(pending, keywords):
+            terms[i] = _join_keyphrases(kws) or texts[i]
+            cache.set(texts[i], terms[i])
+
+    return terms
+
+
+def standalone_backend(backend=None):
+    """
+    The backend for callers that have no classifier forward to reuse
+    (app.py, web_app.py): classifier falls back to lexical there instead of
+    running a second forward.
+    """
+    backend = backend or KEYWORD_BACKEND
+    return "lexical" if backend == "classifier" else backend
+
+
+def build_search_term(text: str, backend=None, keyphrases=None) -> str:
+    """Build a good search term from the user input."""
+    return build_search_terms([text], backend, None if keyphrases is None else [keyphrases])[0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    idf_cmd = sub.add_parser("build-idf", help="build the IDF table from the FakeNewsNet titles")
+    idf_cmd.add_argument("--data-dir", default="data")
+    idf_cmd.add_argument("--out", default=IDF_PATH)
+    term_cmd = sub.add_parser("term", help="print the search term for a text")
+    term_cmd.add_argument("text")
+    term_cmd.add_argument("--backend", choices=BACKENDS, default=None)
+    args = parser.parse_args()
+
+    if args.command == "build-idf":
+        from news_data import load_titles
+        build_idf_table(load_titles(args.data_dir)["title"].tolist(), args.out)
+    else:
+        print(build_search_term(args.text, args.backend))
@@ -0,0 +1,222 @@
+"""
+MinHash/LSH index of already-scored headlines, so rephrasings, other
+outlets' versions and punctuation variants of a headline reuse its verdict
+instead of running the model again.
+
+Headlines are normalized (lower-case, punctuation dropped), cut into
+character shingles and summarized by a MinHash signature. Signatures are
+split into bands; texts that share any band are candidates, and a candidate
+is a hit if the fraction of equal signature slots (an estimate of the
+Jaccard similarity of the shingle sets) reaches the threshold. Only
+confident verdicts are stored.
+"""
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+SHINGLE_SIZE = 4
+NUM_PERM = 128
+BANDS = 32
+_PRIME = (1 << 61) - 1
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9 ]+")
+
+
+def normalize_headline(text: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace."""
+    return " ".join(_NON_ALNUM_RE.sub(" ", text.lower()).split())
+
+
+def shingle_hashes(text: str, size=SHINGLE_SIZE) -> np.ndarray:
+    norm = normalize_headline(text)
+    if len(norm) <= size:
+        shingles = {norm}
+    else:
+        shingles = {norm[i:i + size] for i in range(len(norm) - size + 1)}
+    # crc32 is stable across processes, unlike hash().
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+class NearDupIndex:
+    """
+    Bounded near-duplicate index mapping headlines to a stored value.
+
+    If `db_path` is set, entries are also written to a sqlite file and
+    reloaded on start. Entries stored under a different `version` (model
+    fingerprint) are dropped when the index is opened, as in PredictionCache.
+    Values must be JSON-serializable. A threshold of 0 disables the index.
+    """
+
+    def __init__(self, namespace, threshold=0.9, min_confidence=0.9, max_size=10000,
+                 db_path=None, version="", num_perm=NUM_PERM, bands=BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.namespace = namespace
+        self.threshold = threshold
+        self.min_confidence = min_confidence
+        self.max_size = max_size
+        self.version = version
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hits = 0
+        self.misses = 0
+        # Fixed seed: signatures persisted by one process must match the next one's.
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        self._entries = OrderedDict()   # key -> (signature, value)
+        self._buckets = {}              # (band, band bytes) -> set of keys
+        self._lock = threading.Lock()
+        self._db_path = db_path
+        self._db_conn = None
+        self._db_pid = None
+        if db_path and self.enabled:
+            self._open_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0 and self.max_size > 0
+
+    @property
+    def _db(self):
+        # sqlite connections must not be shared across fork; reopen in children.
+        if self._db_path and self._db_pid != os.getpid():
+            self._db_conn = sqlite3.connect(self._db_path, check_same_thread=False)
+            self._db_pid = os.getpid()
+        return self._db_conn
+
+    def _open_db(self):
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS near_dup ("
+            "namespace TEXT, key TEXT, signature BLOB, value TEXT, created REAL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS near_dup_version (namespace TEXT PRIMARY KEY, version TEXT)"
+        )
+        row = self._db.execute(
+            "SELECT version FROM near_dup_version WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        if row is None or row[0] != self.version:
+            self._db.execute("DELETE FROM near_dup WHERE namespace = ?", (self.namespace,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO near_dup_version (namespace, version) VALUES (?, ?)",
+                (self.namespace, self.version),
+            )
+        self._db.commit()
+
+        rows = self._db.execute(
+            "SELECT key, signature, value FROM near_dup WHERE namespace = ? ORDER BY created DESC LIMIT ?",
+            (self.namespace, self.max_size),
+        ).fetchall()
+        for key, signature, value in reversed(rows):
+            self._remember(key, np.frombuffer(signature, dtype=np.uint64), json.loads(value))
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text)
+        # a * x + b stays below 2**64 for 32-bit a, b and x.
+        return ((self._a * hashes[None, :] + self._b) % _PRIME).min(axis=1)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(normalize_headline(text).encode("utf-8")).hexdigest()
+
+    def lookup(self, text: str):
+        """Returns (value, similarity) of the closest stored headline above the threshold, or None."""
+        if not self.enabled:
+            return None
+        signature = self.signature(text)
+
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                candidates.update(self._buckets.get(band_key, ()))
+
+            best, best_similarity = None, self.threshold
+            for key in candidates:
+                stored_signature, value = self._entries[key]
+                similarity = float(np.mean(stored_signature == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = value, similarity
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return best, best_similarity
+
+    def add(self, text: str, value, confidence: float):
+        """Store `value` for `text` if the verdict is confident enough."""
+        if not self.enabled or confidence < self.min_confidence:
+            return
+        key = self.key(text)
+        signature = self.signature(text)
+
+        with self._lock:
+            evicted = self._remember(key, signature, value)
+            if self._db is not None:
+                if evicted:
+                    self._db.executemany(
+                        "DELETE FROM near_dup WHERE namespace = ? AND key = ?",
+                        [(self.namespace, k) for k in evicted],
+                    )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO near_dup (namespace, key, signature, value, created) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, signature.tobytes(), json.dumps(value), time.time()),
+                )
+                self._db.commit()
+
+    def _remember(self, key, signature, value):
+        """Insert into memory and the LSH buckets; returns the keys evicted to stay bounded."""
+        if key in self._entries:
+            self._forget(key)
+        self._entries[key] = (signature, value)
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+        evicted = []
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._forget(oldest)
+            evicted.append(oldest)
+        return evicted
+
+    def _forget(self, key):
+        signature, _ = self._entries.pop(key)
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def clear(self):
+        """Drop every entry (memory and sqlite) and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM near_dup WHERE namespace = ?", (self.namespace,))
+                self._db.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
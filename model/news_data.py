@@ -0,0 +1,24 @@
+import os
+import pandas as pd
+
+# FakeNewsNet CSVs and their labels (1 = REAL, 0 = FAKE)
+DATA_FILES = {
+    "politifact_real.csv": 1,
+    "politifact_fake.csv": 0,
+    "gossipcop_real.csv": 1,
+    "gossipcop_fake.csv": 0
+}
+
+
+def load_titles(data_dir, files=DATA_FILES):
+    """Load every CSV in `files` from `data_dir` as one (title, label) frame."""
+    all_data = []
+    for file_name, label in files.items():
+        path = os.path.join(data_dir, file_name)
+        df = pd.read_csv(path)
+        if "title" in df.columns:
+            df = df[["title"]].copy()
+            df["label"] = label
+            all_data.append(df)
+
+    return pd.concat(all_data).dropna().reset_index(drop=True)
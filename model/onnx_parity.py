@@ -0,0 +1,104 @@
+"""
+Check that the ONNX backend matches the torch backend on the manual test set,
+and report latency and memory for each.
+
+Run from the project root after model/export_onnx.py:
+    python model/onnx_parity.py
+"""
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+TEST_FILE = "data/manual_test.csv"
+TEXT_COL = "text"
+TOLERANCE = 0.05  # max abs difference in class probabilities
+
+
+def _rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1e6
+    except ImportError:
+        import resource
+        # ru_maxrss is peak RSS in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _run_backend(backend, texts, batch_size):
+    """Runs in a fresh process so each backend's memory is measured alone."""
+    os.environ["PREDICT_BACKEND"] = backend
+    os.environ["PREDICT_CACHE_SIZE"] = "0"
+    rss_before = _rss_mb()
+    import predict
+
+    # Loading is lazy: load (and run one warm-up forward) before measuring.
+    predict.warmup()
+    rss_loaded = _rss_mb()
+
+    start = time.perf_counter()
+    for text in texts:
+        predict._predict_batch([text])
+    single_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = predict._predict_sorted(texts, batch_size)
+    batch_s = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "probs": [probs for _, _, probs in results],
+        "labels": [label for label, _, _ in results],
+        "single_ms": 1000 * single_s / len(texts),
+        "batch_ms": 1000 * batch_s / len(texts),
+        "model_rss_mb": rss_loaded - rss_before,
+        "peak_rss_mb": _rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--test-file", default=TEST_FILE)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.test_file)[TEXT_COL].astype(str).tolist()
+    print(f"[INFO] Loaded {len(texts)} test samples")
+
+    reports = {}
+    ctx = multiprocessing.get_context("spawn")
+    for backend in ("torch", "onnx"):
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            reports[backend] = pool.submit(_run_backend, backend, texts, args.batch_size).result()
+
+    torch_r, onnx_r = reports["torch"], reports["onnx"]
+    max_diff = max(
+        abs(a - b)
+        for p_t, p_o in zip(torch_r["probs"], onnx_r["probs"])
+        for a, b in zip(p_t, p_o)
+    )
+    agreement = sum(a == b for a, b in zip(torch_r["labels"], onnx_r["labels"])) / len(texts)
+
+    print("\n=== PARITY ===")
+    print(f"max |prob diff|: {max_diff:.4f} (tolerance {args.tolerance})")
+    print(f"label agreement: {agreement:.4f}")
+
+    print("\n=== LATENCY / MEMORY ===")
+    print(f"{'backend':<8} {'single ms':>10} {'batched ms':>11} {'model MB':>9} {'peak MB':>8}")
+    for r in (torch_r, onnx_r):
+        print(f"{r['backend']:<8} {r['single_ms']:>10.2f} {r['batch_ms']:>11.2f} "
+              f"{r['model_rss_mb']:>9.0f} {r['peak_rss_mb']:>8.0f}")
+    print(f"speedup (single): {torch_r['single_ms'] / onnx_r['single_ms']:.2f}x")
+
+    if max_diff > args.tolerance:
+        print("[FAIL] ONNX backend differs from torch beyond tolerance")
+        sys.exit(1)
+    print("[OK] ONNX backend within tolerance")
+
+
+if __name__ == "__main__":
+    main()
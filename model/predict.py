@@ -1,25 +1,405 @@
+import os
+import threading
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch.nn.functional as F
 
-MODEL_PATH = "model/bert_fakenews"
+try:
+    from model.batching import MicroBatcher
+    from model.cache import PredictionCache, model_fingerprint
+    from model.near_dup import NearDupIndex
+    from model.instrumentation import stage, record_batch
+except ImportError:  # running from inside model/ (e.g. python model/accuracy.py)
+    from batching import MicroBatcher
+    from cache import PredictionCache, model_fingerprint
+    from near_dup import NearDupIndex
+    from instrumentation import stage, record_batch
+
+# Resolved relative to this file, so callers don't need to chdir to the project root.
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(MODEL_DIR, "bert_fakenews")
 LABELS = {0: "FAKE", 1: "REAL"}
+MAX_LENGTH = 128
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_PATH)
-model.eval()
+# Inference backend: "torch" (eager PyTorch) or "onnx" (ONNX Runtime, INT8
+# model produced by model/export_onnx.py).
+BACKEND = os.getenv("PREDICT_BACKEND", "torch")
+ONNX_PATH = os.getenv("PREDICT_ONNX_PATH", os.path.join(MODEL_DIR, "bert_fakenews_onnx", "model.int8.onnx"))
+
+# Intra-op threads per process (0 = library default, i.e. all cores). Set this
+# when running several workers on one node so they don't oversubscribe cores.
+NUM_THREADS = int(os.getenv("PREDICT_NUM_THREADS", "0"))
+
+# Micro-batching: concurrent predict_news calls are collected for up to
+# BATCH_WINDOW_MS and run as one padded forward of at most MAX_BATCH_SIZE.
+BATCHING_ENABLED = os.getenv("PREDICT_BATCHING", "0") == "1"
+BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "5"))
+MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", "32"))
+
+# Chunk size for predict_news_batch (bulk scoring).
+BULK_BATCH_SIZE = int(os.getenv("PREDICT_BULK_BATCH_SIZE", "64"))
+
+# Result cache keyed on normalized text. PREDICT_CACHE_SIZE=0 disables it;
+# PREDICT_CACHE_DB points at a sqlite file to keep entries across restarts.
+CACHE_SIZE = int(os.getenv("PREDICT_CACHE_SIZE", "10000"))
+CACHE_TTL_S = float(os.getenv("PREDICT_CACHE_TTL_S", "3600"))
+CACHE_DB = os.getenv("PREDICT_CACHE_DB") or None
+
+# Long documents: texts longer than LONG_DOC_MIN_WORDS are tokenized once into
+# overlapping MAX_LENGTH-token windows (WINDOW_STRIDE tokens of overlap, at most
+# MAX_WINDOWS per text), all windows are scored in one batch and their
+# probabilities aggregated: "mean", "max" (the most confident window) or
+# "weighted" (softmax over each window's logit margin). "off" (the default)
+# truncates at MAX_LENGTH, as before. Shorter texts always take the plain path.
+LONG_DOC_AGGREGATION = os.getenv("PREDICT_LONG_DOC", "off")
+LONG_DOC_MIN_WORDS = int(os.getenv("PREDICT_LONG_DOC_MIN_WORDS", str((MAX_LENGTH - 2) // 2)))
+WINDOW_STRIDE = int(os.getenv("PREDICT_WINDOW_STRIDE", "32"))
+MAX_WINDOWS = int(os.getenv("PREDICT_MAX_WINDOWS", "16"))
+AGGREGATIONS = ("off", "mean", "max", "weighted")
+
+# Near-duplicate index (model/near_dup.py): a headline whose shingles are at
+# least NEAR_DUP_THRESHOLD similar to an already-scored one reuses its verdict,
+# if that verdict had at least NEAR_DUP_MIN_CONFIDENCE. 0 disables it, as does
+# PREDICT_CACHE_SIZE=0. PREDICT_NEAR_DUP_DB (default: PREDICT_CACHE_DB) persists it.
+NEAR_DUP_THRESHOLD = float(os.getenv("PREDICT_NEAR_DUP_THRESHOLD", "0.9"))
+NEAR_DUP_MIN_CONFIDENCE = float(os.getenv("PREDICT_NEAR_DUP_MIN_CONFIDENCE", "0.9"))
+NEAR_DUP_DB = os.getenv("PREDICT_NEAR_DUP_DB") or CACHE_DB
+
+if BACKEND not in ("torch", "onnx"):
+    raise ValueError(f"Unknown PREDICT_BACKEND '{BACKEND}' (expected 'torch' or 'onnx')")
+if LONG_DOC_AGGREGATION not in AGGREGATIONS:
+    raise ValueError(f"Unknown PREDICT_LONG_DOC '{LONG_DOC_AGGREGATION}' (expected one of {AGGREGATIONS})")
+
+# Nothing is loaded at import time. load_model() loads the tokenizer and the
+# selected backend (called explicitly by the ML service's warm-up, or lazily
+# by the first prediction). The other backend is created on first use
+# (e.g. by the parity check).
+tokenizer = None
+model = None
+onnx_session = None
+_load_lock = threading.Lock()
+
+
+def get_tokenizer():
+    global tokenizer
+    if tokenizer is None:
+        with _load_lock:
+            if tokenizer is None:
+                tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
+    return tokenizer
+
+
+def get_torch_model():
+    global model
+    if model is None:
+        with _load_lock:
+            if model is None:
+                loaded = AutoModelForSequenceClassification.from_pretrained(MODEL_PATH)
+                loaded.eval()
+                model = loaded
+    return model
+
+
+def get_onnx_session(path=ONNX_PATH):
+    global onnx_session
+    if onnx_session is None:
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("PREDICT_BACKEND=onnx requires onnxruntime (pip install onnxruntime)")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found. Run: python model/export_onnx.py")
+        with _load_lock:
+            if onnx_session is None:
+                options = ort.SessionOptions()
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                if NUM_THREADS:
+                    options.intra_op_num_threads = NUM_THREADS
+                onnx_session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+    return onnx_session
+
+
+def load_model():
+    """Load the tokenizer and the selected backend (idempotent)."""
+    configure_threads()
+    get_tokenizer()
+    if BACKEND == "onnx":
+        get_onnx_session()
+    else:
+        get_torch_model()
+
+
+def preload_for_fork():
+    """
+    Load weights in a pre-fork server's master process. Forked workers then
+    share the weight pages copy-on-write instead of each loading a copy.
+
+    No inference runs here: torch's OpenMP pool and ONNX Runtime sessions are
+    not fork-safe once started, so the ONNX session is left to each worker.
+    """
+    get_tokenizer()
+    if BACKEND == "torch":
+        get_torch_model()
+
+
+def configure_threads(num_threads=None):
+    """Set intra-op threads for this process (call in each worker after fork)."""
+    global NUM_THREADS
+    NUM_THREADS = num_threads or NUM_THREADS
+    if NUM_THREADS:
+        torch.set_num_threads(NUM_THREADS)
+
+
+def is_loaded() -> bool:
+    return tokenizer is not None and (onnx_session if BACKEND == "onnx" else model) is not None
+
+
+def warmup():
+    """Load everything and run one dummy forward so the first real request is not slow."""
+    load_model()
+    _predict_batch(["Warm-up headline for the fake news classifier."])
+
+# Cached entries from an older model are dropped when the fingerprint changes.
+# Long-document aggregation changes results too, so it is part of the version.
+MODEL_VERSION = (
+    model_fingerprint(MODEL_PATH)
+    + ("-onnx" if BACKEND == "onnx" else "")
+    + (f"-{LONG_DOC_AGGREGATION}" if LONG_DOC_AGGREGATION != "off" else "")
+)
+prediction_cache = PredictionCache(
+    "predict", max_size=CACHE_SIZE, ttl=CACHE_TTL_S, db_path=CACHE_DB, version=MODEL_VERSION
+)
+near_dup_index = NearDupIndex(
+    "near_dup_predict", threshold=NEAR_DUP_THRESHOLD, min_confidence=NEAR_DUP_MIN_CONFIDENCE,
+    max_size=CACHE_SIZE, db_path=NEAR_DUP_DB, version=MODEL_VERSION,
+)
+
+_batcher = None
+
+
+def _forward_logits(inputs, backend=None):
+    if (backend or BACKEND) == "onnx":
+        feeds = {
+            "input_ids": inputs["input_ids"].numpy(),
+            "attention_mask": inputs["attention_mask"].numpy(),
+        }
+        return torch.from_numpy(get_onnx_session().run(["logits"], feeds)[0])
 
-def predict_news(text: str):
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=128)
-    
     with torch.no_grad():
-        outputs = model(**inputs)
-        logits = outputs.logits
-        probs = F.softmax(logits, dim=1)[0]
+        return get_torch_model()(**inputs).logits
+
+
+def last_hidden_states(inputs, backend=None):
+    """Last-layer hidden states [batch, seq, hidden] (the ONNX model exports them for this)."""
+    if (backend or BACKEND) == "onnx":
+        feeds = {
+            "input_ids": inputs["input_ids"].numpy(),
+            "attention_mask": inputs["attention_mask"].numpy(),
+        }
+        return torch.from_numpy(get_onnx_session().run(["last_hidden_state"], feeds)[0]).float()
+
+    with torch.no_grad():
+        return get_torch_model()(**inputs, output_hidden_states=True).hidden_states[-1]
+
+
+def is_long(text):
+    """Whether `text` takes the sliding-window path (a word count, so no tokenization)."""
+    return LONG_DOC_AGGREGATION != "off" and len(text.split()) > LONG_DOC_MIN_WORDS
+
 
-    pred_class = torch.argmax(probs).item()
-    confidence = probs[pred_class].item()
+def aggregate_windows(logits, doc_ids, num_docs, aggregation):
+    """Per-document probabilities from per-window logits, without a Python loop over windows."""
+    probs = F.softmax(logits, dim=1)
+    if aggregation == "max":
+        # Keep the most confident window(s) of each document.
+        confidence = probs.max(dim=1).values
+        best = torch.zeros(num_docs).scatter_reduce(0, doc_ids, confidence, reduce="amax", include_self=False)
+        weights = (confidence == best[doc_ids]).float()
+    elif aggregation == "weighted":
+        # Softmax over the windows of each document, scored by their logit margin.
+        # Shifted by each document's own largest margin, so no document underflows.
+        top2 = logits.topk(2, dim=1).values
+        margin = top2[:, 0] - top2[:, 1]
+        best = torch.zeros(num_docs).scatter_reduce(0, doc_ids, margin, reduce="amax", include_self=False)
+        weights = torch.exp(margin - best[doc_ids])
+    else:
+        weights = torch.ones(len(doc_ids))
+
+    totals = torch.zeros(num_docs).index_add_(0, doc_ids, weights)
+    summed = torch.zeros(num_docs, probs.shape[1]).index_add_(0, doc_ids, probs * weights.unsqueeze(1))
+    return summed / totals.unsqueeze(1)
+
+
+def tokenize_windows(texts, **kwargs):
+    """
+    One tokenizer call for the overlapping MAX_LENGTH-token windows of
+    `texts`. Returns (encoded, doc_ids, ranks): the document of each window
+    and its position within that document (0 is the plain truncated input).
+    """
+    encoded = get_tokenizer()(
+        list(texts), return_tensors="pt", truncation=True, padding=True, max_length=MAX_LENGTH,
+        stride=WINDOW_STRIDE, return_overflowing_tokens=True, **kwargs,
+    )
+    doc_ids = encoded.pop("overflow_to_sample_mapping")
+    counts = torch.bincount(doc_ids, minlength=len(texts))
+    starts = torch.cumsum(counts, 0) - counts
+    return encoded, doc_ids, torch.arange(len(doc_ids)) - starts[doc_ids]
+
+
+def window_logits(inputs, backend=None):
+    """Logits for many windows, in chunks of BULK_BATCH_SIZE."""
+    num_rows = len(inputs["input_ids"])
+    return torch.cat([
+        _forward_logits({k: v[start:start + BULK_BATCH_SIZE] for k, v in inputs.items()}, backend).float()
+        for start in range(0, num_rows, BULK_BATCH_SIZE)
+    ])
+
+
+def window_probs(texts, backend=None, aggregation=None):
+    """
+    Sliding-window probabilities for long `texts`: one tokenizer call returns
+    every overlapping window (at most MAX_WINDOWS per text), and all windows
+    go through the model together. Returns a [len(texts), num_labels] tensor.
+    """
+    aggregation = aggregation or LONG_DOC_AGGREGATION
+    with stage("tokenize"):
+        encoded, doc_ids, ranks = tokenize_windows(texts)
+        keep = ranks < MAX_WINDOWS
+        inputs = {k: v[keep] for k, v in encoded.items()}
+        doc_ids = doc_ids[keep]
+
+    record_batch("predict_windows", len(doc_ids))
+    with stage("forward"):
+        logits = window_logits(inputs, backend)
+    return aggregate_windows(logits, doc_ids, len(texts), aggregation)
+
+
+def _predict_batch(texts, backend=None):
+    """Run one padded forward over `texts` and return a result tuple per text."""
+    record_batch("predict", len(texts))
+    long_idx = [i for i, text in enumerate(texts) if is_long(text)]
+    if long_idx:
+        return _predict_mixed(texts, long_idx, backend)
+
+    with stage("tokenize"):
+        inputs = get_tokenizer()(texts, return_tensors="pt", truncation=True, padding=True, max_length=MAX_LENGTH)
+
+    with stage("forward"):
+        probs = F.softmax(_forward_logits(inputs, backend), dim=1)
+
+    return _to_results(probs)
+
+
+def _predict_mixed(texts, long_idx, backend=None):
+    """Short texts as one plain batch, long texts through the sliding windows."""
+    long_set = set(long_idx)
+    short_idx = [i for i in range(len(texts)) if i not in long_set]
+    probs = torch.zeros(len(texts), len(LABELS))
+    probs[long_idx] = window_probs([texts[i] for i in long_idx], backend)
+    if short_idx:
+        with stage("tokenize"):
+            inputs = get_tokenizer()([texts[i] for i in short_idx], return_tensors="pt",
+                                     truncation=True, padding=True, max_length=MAX_LENGTH)
+        with stage("forward"):
+            probs[short_idx] = F.softmax(_forward_logits(inputs, backend), dim=1).float()
+    return _to_results(probs)
+
+
+def _to_results(probs):
+    confidences, pred_classes = probs.max(dim=1)
+    return [
+        (LABELS[pred_class], confidence, row)
+        for pred_class, confidence, row in zip(pred_classes.tolist(), confidences.tolist(), probs.tolist())
+    ]
+
+
+def _predict_sorted(texts, batch_size=BULK_BATCH_SIZE):
+    """
+    Inputs are sorted by length and split into chunks, so each chunk is only
+    padded to its own longest item instead of the longest text overall.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    results = [None] * len(texts)
+
+    for start in range(0, len(order), batch_size):
+        chunk = order[start:start + batch_size]
+        for i, result in zip(chunk, _predict_batch([texts[i] for i in chunk])):
+            results[i] = result
+
+    return results
+
+
+def predict_news_batch(texts, batch_size=BULK_BATCH_SIZE):
+    """
+    Score many texts at once. Returns one (label, confidence, probs) tuple
+    per input, in input order. Only texts missing from the cache and the
+    near-duplicate index are run through the model.
+    """
+    texts = list(texts)
+    results = [None] * len(texts)
+    misses = []
+
+    for i, text in enumerate(texts):
+        cached = _cached_result(text)
+        if cached is not None:
+            results[i] = cached
+        else:
+            misses.append(i)
+
+    scored = _predict_sorted([texts[i] for i in misses], batch_size)
+    for i, result in zip(misses, scored):
+        _remember_result(texts[i], result)
+        results[i] = result
+
+    return results
+
+
+def _cached_result(text):
+    """Exact cache first, then the stored verdict of a near-duplicate headline."""
+    cached = prediction_cache.get(text)
+    if cached is not None:
+        return tuple(cached)
+    near = near_dup_index.lookup(text)
+    if near is not None:
+        result = tuple(near[0])
+        prediction_cache.set(text, result)
+        return result
+    return None
+
+
+def _remember_result(text, result):
+    prediction_cache.set(text, result)
+    near_dup_index.add(text, result, result[1])
+
+
+def invalidate_prediction_cache():
+    """Drop all cached predictions, e.g. after replacing model/bert_fakenews."""
+    prediction_cache.clear()
+    near_dup_index.clear()
+
+
+def enable_batching(window_ms=None, max_batch_size=None):
+    """Route predict_news through a shared MicroBatcher (used by the ML service)."""
+    global _batcher, BATCHING_ENABLED
+    if _batcher is None:
+        _batcher = MicroBatcher(
+            _predict_sorted,
+            window_ms=BATCH_WINDOW_MS if window_ms is None else window_ms,
+            max_batch_size=MAX_BATCH_SIZE if max_batch_size is None else max_batch_size,
+        )
+    BATCHING_ENABLED = True
+    return _batcher
+
+
+def predict_news(text: str):
+    cached = _cached_result(text)
+    if cached is not None:
+        return cached
 
-    label = LABELS[pred_class]
+    if BATCHING_ENABLED:
+        result = (_batcher or enable_batching())(text)
+    else:
+        result = _predict_batch([text])[0]
 
-    return label, confidence, probs.tolist()
+    _remember_result(text, result)
+    return result
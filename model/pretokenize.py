@@ -0,0 +1,90 @@
+"""
+Tokenize a corpus once into a memory-mapped on-disk format for training.
+
+Layout of a cache directory:
+    ids.bin       all token ids back to back (no padding), uint16 or int32
+    offsets.npy   int64, n + 1 entries; example i is ids[offsets[i]:offsets[i+1]]
+    labels.npy    int64, n entries
+    meta.json     tokenizer, max_length, dtype, count
+
+The directory name is a hash of the tokenizer, max_length and the data, so a
+changed corpus or tokenizer gets a fresh cache and an unchanged one is reused.
+"""
+import os
+import json
+import hashlib
+import numpy as np
+import torch
+
+CACHE_ROOT = "model_output/token_cache"
+TOKENIZE_CHUNK = 10000
+
+
+def _cache_key(tokenizer, texts, labels, max_length):
+    h = hashlib.sha1()
+    h.update(f"{tokenizer.name_or_path}|{len(tokenizer)}|{max_length}".encode())
+    for text, label in zip(texts, labels):
+        h.update(text.encode("utf-8"))
+        h.update(f"\0{label}\n".encode())
+    return h.hexdigest()[:16]
+
+
+def build_token_cache(tokenizer, texts, labels, max_length=128, cache_root=CACHE_ROOT):
+    """Tokenize `texts` into a cache directory (or reuse it) and return its path."""
+    cache_dir = os.path.join(cache_root, _cache_key(tokenizer, texts, labels, max_length))
+    if os.path.exists(os.path.join(cache_dir, "meta.json")):
+        print(f"[INFO] Reusing token cache {cache_dir}")
+        return cache_dir
+
+    os.makedirs(cache_dir, exist_ok=True)
+    dtype = np.uint16 if len(tokenizer) < 2 ** 16 else np.int32
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+
+    print(f"[INFO] Tokenizing {len(texts)} examples into {cache_dir}")
+    with open(os.path.join(cache_dir, "ids.bin"), "wb") as ids_file:
+        for start in range(0, len(texts), TOKENIZE_CHUNK):
+            batch = tokenizer(texts[start:start + TOKENIZE_CHUNK], truncation=True, max_length=max_length)
+            for i, ids in enumerate(batch["input_ids"], start=start):
+                offsets[i + 1] = offsets[i] + len(ids)
+                ids_file.write(np.asarray(ids, dtype=dtype).tobytes())
+
+    np.save(os.path.join(cache_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(cache_dir, "labels.npy"), np.asarray(labels, dtype=np.int64))
+    # meta.json is written last: its presence marks the cache as complete.
+    with open(os.path.join(cache_dir, "meta.json"), "w") as f:
+        json.dump({
+            "tokenizer": tokenizer.name_or_path,
+            "max_length": max_length,
+            "dtype": np.dtype(dtype).name,
+            "count": len(texts),
+        }, f)
+    return cache_dir
+
+
+class TokenizedDataset(torch.utils.data.Dataset):
+    """
+    Reads examples from a build_token_cache directory through a memmap.
+    Items are unpadded; pad per batch with DataCollatorWithPadding.
+    """
+
+    def __init__(self, cache_dir):
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.ids = np.memmap(os.path.join(cache_dir, "ids.bin"), dtype=meta["dtype"], mode="r")
+        self.offsets = np.load(os.path.join(cache_dir, "offsets.npy"))
+        self.labels = np.load(os.path.join(cache_dir, "labels.npy"))
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def lengths(self):
+        """Tokens per example, from the offsets alone (used by the length-grouped sampler)."""
+        return np.diff(self.offsets)
+
+    def __getitem__(self, idx):
+        ids = self.ids[self.offsets[idx]:self.offsets[idx + 1]]
+        return {
+            "input_ids": ids.astype(np.int64).tolist(),
+            "labels": int(self.labels[idx]),
+        }
@@ -0,0 +1,206 @@
+"""
+Score a news file in bulk: stream CSV, JSONL or Parquet input, predict in
+batches across a process pool and append label/confidence/probs rows to a
+CSV or JSONL output as they finish.
+
+Progress is committed to `<output>.offset` after every chunk, so a crashed
+or interrupted run picks up where it stopped when started again with the
+same arguments. Only a bounded number of chunks is in flight at a time, so
+memory stays flat whatever the input size.
+
+Run from the project root:
+    python model/score_bulk.py data/gossipcop_real.csv scored.csv --text-col title --workers 4
+    python model/score_bulk.py feed.parquet scored.jsonl --keep-cols id url
+"""
+import os
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Every row is scored once; caching would only add hashing overhead.
+os.environ.setdefault("PREDICT_CACHE_SIZE", "0")
+
+TEXT_COL = "text"
+CHUNK_SIZE = 1024
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl", ".parquet": "parquet"}
+
+
+def _predict():
+    # Imported lazily so the parent never initialises torch before forking workers.
+    try:
+        from model import predict
+    except ImportError:  # running from inside model/
+        import predict
+    return predict
+
+
+def detect_format(path):
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Cannot infer the format of '{path}' (expected one of {sorted(FORMATS)})")
+    return fmt
+
+
+def iter_chunks(path, columns, chunk_size=CHUNK_SIZE, skip_rows=0):
+    """Yield DataFrames of at most `chunk_size` rows, starting after `skip_rows` rows."""
+    fmt = detect_format(path)
+    if fmt == "csv":
+        # skiprows keeps the header (line 0) and avoids parsing the rows already done.
+        reader = pd.read_csv(path, usecols=columns, chunksize=chunk_size,
+                             skiprows=range(1, skip_rows + 1) if skip_rows else None)
+        yield from reader
+        return
+
+    if fmt == "jsonl":
+        chunks = (chunk[columns] for chunk in pd.read_json(path, lines=True, chunksize=chunk_size))
+    else:
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns)
+        chunks = (batch.to_pandas() for batch in batches)
+
+    seen = 0
+    for chunk in chunks:
+        if seen + len(chunk) <= skip_rows:
+            seen += len(chunk)
+            continue
+        if seen < skip_rows:
+            chunk = chunk.iloc[skip_rows - seen:]
+        seen += len(chunk)
+        yield chunk
+
+
+def _init_worker(num_threads):
+    _predict().configure_threads(num_threads)
+
+
+def score_texts(texts, batch_size):
+    """Returns [(label, confidence, probs)] for `texts`."""
+    predict = _predict()
+    return predict.predict_news_batch(texts, batch_size or predict.BULK_BATCH_SIZE)
+
+
+class ResultWriter:
+    """Appends scored rows and records the committed offset next to the output."""
+
+    def __init__(self, path, keep_cols, resume=True):
+        self.path = path
+        self.offset_path = path + ".offset"
+        self.fmt = detect_format(path)
+        if self.fmt == "parquet":
+            raise ValueError("Parquet cannot be appended to; write .csv or .jsonl instead")
+        self.keep_cols = keep_cols
+        self.rows = 0
+
+        state = None
+        if resume and os.path.exists(self.offset_path):
+            with open(self.offset_path) as f:
+                state = json.load(f)
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else -1
+            if size < state["bytes"]:
+                # Output deleted or cut short: truncating would pad it with NULs.
+                print(f"[WARN] {self.path} is missing or shorter than its offset file; "
+                      f"starting again from row 0")
+                state = None
+        if state is not None:
+            self.rows = state["rows"]
+            # Drop anything written after the last commit (a crash between the
+            # output write and the offset update).
+            with open(self.path, "a+b") as f:
+                f.truncate(state["bytes"])
+        else:
+            for stale in (self.path, self.offset_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+        self.file = open(self.path, "a", encoding="utf-8", newline="")
+
+    def write(self, chunk, predictions):
+        out = chunk[self.keep_cols].copy() if self.keep_cols else pd.DataFrame(index=chunk.index)
+        out["label"] = [label for label, _, _ in predictions]
+        out["confidence"] = [round(confidence, 6) for _, confidence, _ in predictions]
+        probs = [[round(p, 6) for p in ps] for _, _, ps in predictions]
+
+        if self.fmt == "csv":
+            out["probs"] = [json.dumps(p) for p in probs]
+            out.to_csv(self.file, header=self.file.tell() == 0, index=False)
+        else:
+            out["probs"] = probs
+            lines = out.to_json(orient="records", lines=True, force_ascii=False)
+            if lines:
+                self.file.write(lines if lines.endswith("\n") else lines + "\n")
+        self.commit(len(out))
+
+    def commit(self, rows):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.rows += rows
+        tmp = self.offset_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"rows": self.rows, "bytes": self.file.tell()}, f)
+        os.replace(tmp, self.offset_path)
+
+    def close(self):
+        self.file.close()
+
+
+def score_file(input_path, output_path, text_col=TEXT_COL, keep_cols=(), chunk_size=CHUNK_SIZE,
+               batch_size=None, workers=1, resume=True):
+    keep_cols = [c for c in keep_cols if c != text_col]
+    writer = ResultWriter(output_path, keep_cols, resume)
+    if writer.rows:
+        print(f"[INFO] Resuming after {writer.rows} committed rows")
+    chunks = iter_chunks(input_path, [text_col, *keep_cols], chunk_size, writer.rows)
+
+    def texts_of(chunk):
+        return chunk[text_col].fillna("").astype(str).tolist()
+
+    try:
+        if workers <= 1:
+            for chunk in chunks:
+                writer.write(chunk, score_texts(texts_of(chunk), batch_size))
+                print(f"[INFO] Scored {writer.rows} rows")
+            return writer.rows
+
+        # Split cores between workers so they don't oversubscribe the CPU.
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as pool:
+            # Results are written in input order, so the committed offset is
+            # always a prefix of the input. At most 2 chunks per worker are queued.
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append((chunk, pool.submit(score_texts, texts_of(chunk), batch_size)))
+                if len(in_flight) >= 2 * workers:
+                    done, future = in_flight.popleft()
+                    writer.write(done, future.result())
+                    print(f"[INFO] Scored {writer.rows} rows")
+            while in_flight:
+                done, future = in_flight.popleft()
+                writer.write(done, future.result())
+                print(f"[INFO] Scored {writer.rows} rows")
+        return writer.rows
+    finally:
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help=".csv, .jsonl or .parquet file")
+    parser.add_argument("output", help=".csv or .jsonl file")
+    parser.add_argument("--text-col", default=TEXT_COL)
+    parser.add_argument("--keep-cols", nargs="*", default=[], help="input columns copied to the output")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per committed chunk")
+    parser.add_argument("--batch-size", type=int, default=None, help="rows per model forward")
+    parser.add_argument("--workers", type=int, default=1, help="scoring processes (CPU only)")
+    parser.add_argument("--no-resume", action="store_true", help="start over instead of resuming")
+    args = parser.parse_args()
+
+    rows = score_file(args.input, args.output, args.text_col, args.keep_cols, args.chunk_size,
+                      args.batch_size, args.workers, resume=not args.no_resume)
+    print(f"[INFO] Done: {rows} rows in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
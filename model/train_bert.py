@@ -1,103 +1,71 @@
+"""
+Fine-tune DistilBERT on the FakeNewsNet titles.
+
+Run from the project root:
+    python model/train_bert.py --config model/train_config.example.json
+    python model/train_bert.py --data-dir data --epochs 3 --bf16 --num-threads 8
+
+Settings come from DEFAULTS, then the --config JSON file, then CLI flags.
+Training resumes from the newest checkpoint-* in output_dir unless
+--no-resume is given or that checkpoint's run had finished, so an interrupted
+nightly run picks up where it stopped. When a run starts fresh, the old
+checkpoints are moved to output_dir/previous_run, so every checkpoint-* in
+output_dir belongs to the current run. A run stopped by --max-hours only
+leaves its checkpoint; save_dir is written once training completes.
+"""
 import os
-import pandas as pd
+import json
+import glob
+import shutil
+import time
+import argparse
 import torch
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 from transformers import (
     DistilBertTokenizerFast,
     DistilBertForSequenceClassification,
+    DataCollatorWithPadding,
     Trainer,
+    TrainerCallback,
+    TrainerState,
     TrainingArguments,
 )
+from transformers.trainer_pt_utils import LengthGroupedSampler
+from transformers.trainer_utils import get_last_checkpoint
+from pretokenize import build_token_cache, TokenizedDataset
+from news_data import load_titles
 
-# === 1. Load and label dataset ===
-base_path = "C:/Users/soumy/fake-news-detector/data"
-files = {
-    "politifact_real.csv": 1,
-    "politifact_fake.csv": 0,
-    "gossipcop_real.csv": 1,
-    "gossipcop_fake.csv": 0
+DEFAULTS = {
+    "data_dir": "data",
+    "output_dir": "model_output",
+    "save_dir": "model/bert_fakenews",
+    "base_model": "distilbert-base-uncased",
+    "max_length": 128,
+    "val_size": 0.2,
+    "seed": 42,
+    "epochs": 3,
+    "batch_size": 16,            # per step; effective batch = batch_size * grad_accum_steps
+    "eval_batch_size": 32,
+    "grad_accum_steps": 1,
+    "learning_rate": 5e-5,
+    "weight_decay": 0.01,
+    "class_weights": [3.0, 1.0],  # more weight on class 0 (FAKE)
+    "save_steps": 0,             # 0 = save once per epoch
+    "save_total_limit": 2,       # checkpoints kept in output_dir (plus the best one)
+    "resume": True,
+    "use_cpu": False,
+    "bf16": False,               # bf16 autocast (works on recent CPUs)
+    "num_threads": 0,            # torch intra-op threads, 0 = default
+    "max_hours": 0.0,            # stop (and checkpoint) after this long, 0 = no limit
 }
 
-all_data = []
-for file_name, label in files.items():
-    path = os.path.join(base_path, file_name)
-    df = pd.read_csv(path)
-    if "title" in df.columns:
-        df = df[["title"]]
-        df["label"] = label
-        all_data.append(df)
-
-df_full = pd.concat(all_data).dropna().reset_index(drop=True)
-
-# === 2. Split into train and validation sets ===
-train_texts, val_texts, train_labels, val_labels = train_test_split(
-    df_full["title"].tolist(), df_full["label"].tolist(), test_size=0.2, random_state=42
-)
-
-# === 3. Tokenize the texts ===
-tokenizer = DistilBertTokenizerFast.from_pretrained("distilbert-base-uncased")
-train_encodings = tokenizer(train_texts, truncation=True, padding=True, max_length=128)
-val_encodings = tokenizer(val_texts, truncation=True, padding=True, max_length=128)
-
-# === 4. PyTorch Dataset class ===
-class NewsDataset(torch.utils.data.Dataset):
-    def __init__(self, encodings, labels):
-        self.encodings = encodings
-        self.labels = labels
-    def __len__(self):
-        return len(self.labels)
-    def __getitem__(self, idx):
-        return {
-            **{key: torch.tensor(val[idx]) for key, val in self.encodings.items()},
-            "labels": torch.tensor(self.labels[idx])
-        }
-
-train_dataset = NewsDataset(train_encodings, train_labels)
-val_dataset = NewsDataset(val_encodings, val_labels)
-
-# === 5. Load model ===
-model = DistilBertForSequenceClassification.from_pretrained("distilbert-base-uncased", num_labels=2)
-
-# === 6. Define custom weighted loss function ===
-class_weights = torch.tensor([3.0, 1.0])  # More weight on class 0 (FAKE)P
-loss_fn = torch.nn.CrossEntropyLoss(weight=class_weights.to(model.device))
-
-# def compute_loss(model, inputs, return_outputs=False, **kwargs):
-#     # Hugging Face Trainer passes a dict-like object with keys like input_ids, attention_mask, labels
-#     if isinstance(inputs, dict):
-#         labels = inputs["labels"]
-#         input_data = {k: v for k, v in inputs.items() if k != "labels"}
-#     else:
-#         raise TypeError("Expected inputs to be a dictionary")
-
-#     outputs = model(**input_data)
-#     logits = outputs.logits
-
-#     class_weights = torch.tensor([3.0, 1.0]).to(logits.device)
-#     loss_fn = torch.nn.CrossEntropyLoss(weight=class_weights)
-#     loss = loss_fn(logits, labels)
-
-#     return (loss, outputs) if return_outputs else loss
-
-# === 7. Training Arguments ===
-training_args = TrainingArguments(
-    output_dir="./model_output",
-    eval_strategy="epoch",             # Evaluate at the end of each epoch
-    save_strategy="epoch",                   # Save model at each epoch
-    logging_strategy="epoch",
-    load_best_model_at_end=True,
-    metric_for_best_model="eval_loss",
-    num_train_epochs=3,
-    per_device_train_batch_size=16,
-    per_device_eval_batch_size=32,
-    weight_decay=0.01,
-    logging_dir="./logs",
-)
-
-from transformers import Trainer
 
 class WeightedLossTrainer(Trainer):
+    def __init__(self, *args, class_weights=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.class_weights = torch.tensor(class_weights or DEFAULTS["class_weights"])
+
     def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
         labels = inputs["labels"]
         inputs = {k: v for k, v in inputs.items() if k != "labels"}
@@ -106,31 +74,184 @@ class WeightedLossTrainer(Trainer):
         logits = outputs.logits
 
         # Class weight: more importance to FAKE (class 0)
-        class_weights = torch.tensor([3.0, 1.0]).to(logits.device)
-        loss_fn = torch.nn.CrossEntropyLoss(weight=class_weights)
+        loss_fn = torch.nn.CrossEntropyLoss(weight=self.class_weights.to(logits.device))
 
-        loss = loss_fn(logits, labels)
+        # Loss in fp32 even under bf16 autocast
+        loss = loss_fn(logits.float(), labels)
         return (loss, outputs) if return_outputs else loss
 
-# === 8. Trainer ===
-trainer = WeightedLossTrainer(
-    model=model,
-    args=training_args,
-    train_dataset=train_dataset,
-    eval_dataset=val_dataset,
-    #compute_loss_func=compute_loss  # Custom loss function
-)
+    def _get_train_sampler(self, *args, **kwargs):
+        # Without lengths, LengthGroupedSampler reads every example to measure
+        # it; a TokenizedDataset already has them in its offsets.
+        dataset = args[0] if args else kwargs.get("train_dataset") or self.train_dataset
+        if self.args.group_by_length and isinstance(dataset, TokenizedDataset):
+            return LengthGroupedSampler(
+                self.args.train_batch_size * self.args.gradient_accumulation_steps,
+                dataset=dataset,
+                lengths=dataset.lengths.tolist(),
+            )
+        return super()._get_train_sampler(*args, **kwargs)
+
+
+class TimeBudgetCallback(TrainerCallback):
+    """Stop and save a checkpoint once the time budget is spent; the next run resumes."""
+
+    def __init__(self, max_hours):
+        self.deadline = time.time() + max_hours * 3600
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if time.time() >= self.deadline:
+            print("[INFO] Time budget reached, saving checkpoint and stopping")
+            control.should_save = True
+            control.should_training_stop = True
+        return control
+
+
+def _is_finished(checkpoint):
+    state = TrainerState.load_from_json(os.path.join(checkpoint, "trainer_state.json"))
+    return bool(state.max_steps) and state.global_step >= state.max_steps
+
+
+def prepare_output_dir(output_dir, resume=True):
+    """
+    Returns the checkpoint to resume from, or None to start fresh. Starting
+    fresh moves the existing checkpoints to output_dir/previous_run (replacing
+    the one before), so a new run never mixes with, overwrites or is hidden
+    behind another run's checkpoints.
+    """
+    checkpoint = get_last_checkpoint(output_dir) if os.path.isdir(output_dir) else None
+    if checkpoint is None:
+        return None
+    if resume and not _is_finished(checkpoint):
+        return checkpoint
+
+    previous = os.path.join(output_dir, "previous_run")
+    print(f"[INFO] Starting a new run; moving old checkpoints to {previous}")
+    shutil.rmtree(previous, ignore_errors=True)
+    os.makedirs(previous)
+    for path in glob.glob(os.path.join(output_dir, "checkpoint-*")):
+        shutil.move(path, previous)
+    return None
+
+
+def load_config(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", help="JSON file with any of the settings below")
+    for key, default in DEFAULTS.items():
+        flag = "--" + key.replace("_", "-")
+        if isinstance(default, bool):
+            parser.add_argument(flag, dest=key, action="store_true", default=None)
+            parser.add_argument("--no-" + key.replace("_", "-"), dest=key, action="store_false")
+        elif isinstance(default, list):
+            parser.add_argument(flag, dest=key, type=float, nargs="+")
+        else:
+            parser.add_argument(flag, dest=key, type=type(default))
+    args = parser.parse_args(argv)
+
+    config = dict(DEFAULTS)
+    if args.config:
+        with open(args.config) as f:
+            file_config = json.load(f)
+        unknown = set(file_config) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown config keys: {sorted(unknown)}")
+        config.update(file_config)
+    config.update({k: v for k, v in vars(args).items() if k in DEFAULTS and v is not None})
+    return config
+
+
+def train(config):
+    if config["num_threads"]:
+        torch.set_num_threads(config["num_threads"])
+
+    # === 1. Load and label dataset ===
+    df_full = load_titles(config["data_dir"])
+
+    # === 2. Split into train and validation sets ===
+    train_texts, val_texts, train_labels, val_labels = train_test_split(
+        df_full["title"].tolist(), df_full["label"].tolist(),
+        test_size=config["val_size"], random_state=config["seed"],
+    )
+
+    # === 3. Tokenize the texts (once, into a memory-mapped cache) ===
+    # No global padding: each batch is padded to its own longest example by the
+    # collator, and group_by_length puts similar lengths in the same batch.
+    tokenizer = DistilBertTokenizerFast.from_pretrained(config["base_model"])
+    cache_root = os.path.join(config["output_dir"], "token_cache")
+    train_cache = build_token_cache(tokenizer, train_texts, train_labels, config["max_length"], cache_root)
+    val_cache = build_token_cache(tokenizer, val_texts, val_labels, config["max_length"], cache_root)
+
+    # === 4. PyTorch Datasets + dynamic padding collator ===
+    train_dataset = TokenizedDataset(train_cache)
+    val_dataset = TokenizedDataset(val_cache)
+    data_collator = DataCollatorWithPadding(tokenizer)
+
+    # === 5. Load model ===
+    model = DistilBertForSequenceClassification.from_pretrained(config["base_model"], num_labels=2)
+
+    # === 6. Training Arguments ===
+    save_strategy = "steps" if config["save_steps"] else "epoch"
+    training_args = TrainingArguments(
+        output_dir=config["output_dir"],
+        eval_strategy=save_strategy,             # must match save_strategy for load_best_model_at_end
+        eval_steps=config["save_steps"] or None,
+        save_strategy=save_strategy,
+        save_steps=config["save_steps"] or 500,
+        save_total_limit=config["save_total_limit"] or None,
+        logging_strategy=save_strategy,
+        logging_steps=config["save_steps"] or 500,
+        load_best_model_at_end=True,
+        metric_for_best_model="eval_loss",
+        num_train_epochs=config["epochs"],
+        per_device_train_batch_size=config["batch_size"],
+        per_device_eval_batch_size=config["eval_batch_size"],
+        gradient_accumulation_steps=config["grad_accum_steps"],
+        learning_rate=config["learning_rate"],
+        weight_decay=config["weight_decay"],
+        logging_dir=os.path.join(config["output_dir"], "logs"),
+        group_by_length=True,                    # length-grouped sampling for the train set
+        use_cpu=config["use_cpu"],
+        bf16=config["bf16"],
+        seed=config["seed"],
+    )
+
+    callbacks = [TimeBudgetCallback(config["max_hours"])] if config["max_hours"] else []
+
+    # === 7. Trainer ===
+    trainer = WeightedLossTrainer(
+        model=model,
+        args=training_args,
+        train_dataset=train_dataset,
+        eval_dataset=val_dataset,
+        data_collator=data_collator,
+        callbacks=callbacks,
+        class_weights=config["class_weights"],
+    )
+
+    # === 8. Train (resuming an unfinished run if any) ===
+    last_checkpoint = prepare_output_dir(config["output_dir"], config["resume"])
+    if last_checkpoint:
+        print(f"[INFO] Resuming from {last_checkpoint}")
+    trainer.train(resume_from_checkpoint=last_checkpoint)
+
+    if trainer.state.global_step < trainer.state.max_steps:
+        # Stopped by the time budget: keep only the checkpoint, never publish a
+        # partially trained model to save_dir. The next run resumes it.
+        print(f"[INFO] Stopped at step {trainer.state.global_step}/{trainer.state.max_steps}; "
+              f"{config['save_dir']} left unchanged")
+        return
+
+    # === 9. Evaluate ===
+    preds = trainer.predict(val_dataset)
+    y_pred = preds.predictions.argmax(-1)
+    print(classification_report(val_labels, y_pred))
 
-# === 9. Train ===
-trainer.train()
+    # === 10. Save model and tokenizer ===
+    model.save_pretrained(config["save_dir"])
+    tokenizer.save_pretrained(config["save_dir"])
 
-# === 10. Evaluate ===
-preds = trainer.predict(val_dataset)
-y_pred = preds.predictions.argmax(-1)
-print(classification_report(val_labels, y_pred))
+    print("✅ DistilBERT model with class weighting fine-tuned and saved!")
 
-# === 11. Save model and tokenizer ===
-model.save_pretrained("./model/bert_fakenews")
-tokenizer.save_pretrained("./model/bert_fakenews")
 
-print("✅ DistilBERT model with class weighting fine-tuned and saved!")
+if __name__ == "__main__":
+    train(load_config())
@@ -1,54 +1,58 @@
-import pandas as pd
+"""
+Train the TF-IDF + RandomForest baseline.
+
+Run from the project root:
+    python model/train_model.py --data-dir data --n-estimators 100
+"""
+import argparse
+import joblib
 from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import classification_report
-import joblib
-import os
-
-# Paths to CSV files
-base_path = "C:/Users/soumy/fake-news-detector/data"
-files = {
-    "politifact_real.csv": 1,
-    "politifact_fake.csv": 0,
-    "gossipcop_real.csv": 1,
-    "gossipcop_fake.csv": 0
-}
-
-all_data = []
-
-# Load and label data
-for file_name, label in files.items():
-    file_path = os.path.join(base_path, file_name)
-    df = pd.read_csv(file_path)
-    if "title" in df.columns:
-        df = df[["title"]]
-        df["label"] = label
-        all_data.append(df)
-
-# Combine everything
-df_full = pd.concat(all_data).dropna().reset_index(drop=True)
-
-# Split
-X_train, X_test, y_train, y_test = train_test_split(df_full["title"], df_full["label"], test_size=0.2, random_state=42)
-
-# TF-IDF
-vectorizer = TfidfVectorizer(stop_words="english", max_df=0.8)
-X_train_vec = vectorizer.fit_transform(X_train)
-X_test_vec = vectorizer.transform(X_test)
-
-# Model
 from sklearn.ensemble import RandomForestClassifier
-model = RandomForestClassifier(class_weight='balanced', n_estimators=100)
+from sklearn.metrics import classification_report
+
+from news_data import load_titles
+
+
+def train(data_dir, model_out, vectorizer_out, n_estimators=100, n_jobs=-1, seed=42):
+    # Load and label data
+    df_full = load_titles(data_dir)
+
+    # Split
+    X_train, X_test, y_train, y_test = train_test_split(
+        df_full["title"], df_full["label"], test_size=0.2, random_state=seed
+    )
+
+    # TF-IDF
+    vectorizer = TfidfVectorizer(stop_words="english", max_df=0.8)
+    X_train_vec = vectorizer.fit_transform(X_train)
+    X_test_vec = vectorizer.transform(X_test)
+
+    # Model
+    model = RandomForestClassifier(
+        class_weight='balanced', n_estimators=n_estimators, n_jobs=n_jobs, random_state=seed
+    )
+
+    model.fit(X_train_vec, y_train)
+
+    # Evaluation
+    y_pred = model.predict(X_test_vec)
+    print(classification_report(y_test, y_pred))
 
-model.fit(X_train_vec, y_train)
+    # Save model
+    joblib.dump(model, model_out)
+    joblib.dump(vectorizer, vectorizer_out)
 
-# Evaluation
-y_pred = model.predict(X_test_vec)
-print(classification_report(y_test, y_pred))
+    print("✅ Model and vectorizer saved!")
 
-# Save model
-joblib.dump(model, "model/fake_news_model.pkl")
-joblib.dump(vectorizer, "model/vectorizer.pkl")
 
-print("✅ Model and vectorizer saved!")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--model-out", default="model/fake_news_model.pkl")
+    parser.add_argument("--vectorizer-out", default="model/vectorizer.pkl")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="CPU cores for the forest (-1 = all)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    train(args.data_dir, args.model_out, args.vectorizer_out, args.n_estimators, args.n_jobs, args.seed)
@@ -0,0 +1,278 @@
+"""
+Common interface for the social-context sources (Reddit, Google News, Twitter).
+
+A Source has one async method, `search(query, limit) -> [Post]`, and wraps
+its blocking upstream call with:
+
+    cache            results are served from social_cache (scrapers/cache.py)
+                     without touching the upstream or the limits below
+    token bucket     at most `rate` calls per second, bursts of up to `burst`
+    backpressure     at most `max_in_flight` upstream calls (its own thread pool);
+                     extra calls fail fast (SourceBusy) instead of queueing
+    retries          up to `retries` more attempts with jittered exponential
+                     backoff, each attempt bounded by `timeout`
+    circuit breaker  after `failure_threshold` failures in a row the source
+                     is skipped (CircuitOpen) for `cooldown_s`, then one
+                     trial call decides whether it closes again
+
+All state is guarded by threading locks rather than asyncio primitives, so a
+source can be shared by several event loops (e.g. the sync fetch_* wrappers,
+which run `search_sync` from worker threads).
+
+`fan_out` queries several sources at once and yields each one's result as
+soon as it arrives, so a degraded upstream only delays (or drops) its own
+posts.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from scrapers.cache import social_cache, make_key
+
+
+@dataclass
+class Post:
+    text: str
+    url: str
+    source: str
+    published: Optional[str] = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class SourceError(Exception):
+    pass
+
+
+class CircuitOpen(SourceError):
+    """The source failed repeatedly and is cooling down."""
+
+
+class SourceBusy(SourceError):
+    """The source already has `max_in_flight` upstream calls running."""
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token; returns how long to wait before it may be used."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, cooldown_s=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown_s else "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True  # one trial call; the others stay skipped
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def release(self):
+        """Give up a trial call that never reached the upstream."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+SOURCE_DEFAULTS = dict(rate=5.0, burst=10, max_in_flight=8, timeout=3.0, retries=1,
+                       backoff_s=0.2, failure_threshold=5, cooldown_s=30.0)
+SOURCE_ENV = dict(rate="RATE", burst="BURST", max_in_flight="MAX_IN_FLIGHT", timeout="TIMEOUT_S",
+                  retries="RETRIES", backoff_s="BACKOFF_S", failure_threshold="FAILURE_THRESHOLD",
+                  cooldown_s="COOLDOWN_S")
+
+
+class Source:
+    """
+    Base class for a social-context source. Subclasses set `name` and
+    implement the blocking `fetch(query, limit) -> [Post]`, which should
+    raise on failure; it runs in a worker thread.
+    """
+
+    name = "source"
+
+    def __init__(self, rate=5.0, burst=10, max_in_flight=8, timeout=3.0, retries=1,
+                 backoff_s=0.2, failure_threshold=5, cooldown_s=30.0):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.max_in_flight = max_in_flight
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, cooldown_s)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"{self.name}-fetch")
+
+    @classmethod
+    def from_env(cls, prefix, **overrides):
+        """Build with `overrides`, then <PREFIX>_RATE, <PREFIX>_TIMEOUT_S, ... from the environment."""
+        config = dict(SOURCE_DEFAULTS, **overrides)
+        for key, suffix in SOURCE_ENV.items():
+            value = os.getenv(f"{prefix}_{suffix}")
+            if value is not None:
+                config[key] = type(config[key])(value)
+        return cls(**config)
+
+    def fetch(self, query, limit):
+        raise NotImplementedError
+
+    def cache_key(self, query, limit):
+        return make_key(self.name, query, limit)
+
+    def _release_slot(self, _future):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    async def _attempt(self, query, limit):
+        with self._in_flight_lock:
+            if self._in_flight >= self.max_in_flight:
+                raise SourceBusy(f"{self.name}: {self._in_flight} calls already in flight")
+            self._in_flight += 1
+        future = self._executor.submit(self.fetch, query, limit)
+        # Released when the upstream call returns: a call abandoned by its
+        # timeout keeps its slot until the thread is actually free again.
+        future.add_done_callback(self._release_slot)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+
+    async def _search_upstream(self, query, limit):
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpen(f"{self.name} is cooling down after repeated failures")
+            try:
+                # Inside the try: a caller can give up (fan_out's deadline) while we wait for a token.
+                await self.bucket.acquire()
+                posts = await self._attempt(query, limit)
+            except (SourceBusy, asyncio.CancelledError):
+                self.breaker.release()  # our own backpressure / caller gave up, not an upstream failure
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                if attempt == self.retries:
+                    raise
+                # Full jitter keeps retries from many requests from arriving together.
+                await asyncio.sleep(random.uniform(0, self.backoff_s * 2 ** attempt))
+            else:
+                self.breaker.record_success()
+                return posts
+
+    async def search(self, query, limit):
+        """Posts for `query`; raises SourceError/TimeoutError/upstream errors on failure."""
+        key = self.cache_key(query, limit)
+        cached, fresh = social_cache.lookup(key)
+        if cached is not None:
+            if not fresh:
+                # Stale-while-revalidate; the refresh goes through the same limits.
+                social_cache.refresh_in_background(key, lambda: asyncio.run(self._search_upstream(query, limit)))
+            return cached
+        return await self.refresh(query, limit)
+
+    async def refresh(self, query, limit):
+        """Like search, but always goes upstream (through the limits) and re-caches the result."""
+        posts = await self._search_upstream(query, limit)
+        social_cache.put(self.cache_key(query, limit), posts)
+        return posts
+
+    def search_sync(self, query, limit):
+        """Blocking search for synchronous callers (not from inside a running event loop)."""
+        return asyncio.run(self.search(query, limit))
+
+    def stats(self):
+        return {
+            "source": self.name,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": self._in_flight,
+        }
+
+
+@dataclass
+class SourceResult:
+    source: str
+    posts: list
+    error: Optional[BaseException] = None
+    seconds: float = 0.0
+    prefetched: bool = False  # served from the prefetch store, no upstream call
+
+
+async def fan_out(sources, query, limit, deadline=None):
+    """
+    Query every source concurrently and yield a SourceResult per source as
+    soon as it finishes, fastest first. Failures are yielded with `error`
+    set and no posts. With `deadline` (seconds), sources still running at
+    the deadline are yielded as timed out.
+    """
+    async def run(source):
+        start = time.perf_counter()
+        try:
+            posts = await source.search(query, limit)
+            return SourceResult(source.name, posts, None, time.perf_counter() - start)
+        except Exception as e:
+            return SourceResult(source.name, [], e, time.perf_counter() - start)
+
+    tasks = {asyncio.ensure_future(run(source)): source for source in sources}
+    try:
+        pending = asyncio.as_completed(list(tasks), timeout=deadline)
+        for next_done in pending:
+            try:
+                yield await next_done
+            except asyncio.TimeoutError:
+                break
+        for task, source in tasks.items():
+            if not task.done():
+                yield SourceResult(source.name, [], asyncio.TimeoutError(f"{source.name} missed the deadline"),
+                                   deadline)
+    finally:
+        for task in tasks:
+            task.cancel()
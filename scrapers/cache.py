@@ -0,0 +1,83 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Fresh for SCRAPER_CACHE_TTL_S; after that, served stale for up to
+# SCRAPER_CACHE_STALE_S more while one background refresh runs.
+CACHE_TTL_S = float(os.getenv("SCRAPER_CACHE_TTL_S", "300"))
+CACHE_STALE_S = float(os.getenv("SCRAPER_CACHE_STALE_S", "600"))
+CACHE_MAX_SIZE = int(os.getenv("SCRAPER_CACHE_SIZE", "1000"))
+
+
+class TTLCache:
+    """
+    Small TTL cache with stale-while-revalidate, keyed on (source, query, ...).
+
+    `fetch` passed to refresh_in_background should raise on failure, so
+    errors are never cached; a failed refresh keeps the stale value.
+    """
+
+    def __init__(self, ttl=CACHE_TTL_S, stale_ttl=CACHE_STALE_S, max_size=CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """
+        (value, fresh) without fetching: fresh within the TTL, not fresh while
+        still servable as stale, and (None, False) on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            value, stored = entry
+            age = time.monotonic() - stored
+            if age >= self.ttl + self.stale_ttl:
+                return None, False
+            self._entries.move_to_end(key)
+            return value, age < self.ttl
+
+    def refresh_in_background(self, key, fetch):
+        with self._lock:
+            self._refresh_in_background(key, fetch)
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _refresh_in_background(self, key, fetch):
+        # Caller holds the lock. Only one refresh per key at a time.
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.put(key, fetch())
+            except Exception as e:
+                print(f"[WARN] Background refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+
+def make_key(source, query, *extra):
+    return (source, " ".join(query.lower().split())) + extra
+
+
+# Shared by all scrapers.
+social_cache = TTLCache()
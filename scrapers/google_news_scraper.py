@@ -1,28 +1,59 @@
+import os
 import feedparser
+import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import quote_plus
 
+from scrapers.base import Source, Post
 
-def fetch_google_news(keyword, max_results=10):
+HTTP_TIMEOUT_S = float(os.getenv("GOOGLE_NEWS_HTTP_TIMEOUT_S", "5"))
+
+# One pooled session for all feed requests (keeps TLS connections alive).
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv("GOOGLE_NEWS_POOL_SIZE", "10"))))
+
+
+def _fetch_feed(keyword, max_results, source="google"):
     # Clean + URL-encode the query (handles spaces and special chars)
     query = quote_plus(keyword.strip())
     feed_url = f"https://news.google.com/rss/search?q={query}"
 
-    try:
-        feed = feedparser.parse(feed_url)
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch Google News feed: {e}")
-        return []
+    response = _session.get(feed_url, timeout=HTTP_TIMEOUT_S)
+    response.raise_for_status()
+    feed = feedparser.parse(response.content)
 
     results = []
 
     # If parsing failed badly, feed.entries might be empty
     for entry in feed.entries[:max_results]:
         results.append(
-            {
-                "text": entry.title,
-                "url": entry.link,
-                "published": getattr(entry, "published", ""),
-            }
+            Post(
+                text=entry.title,
+                url=entry.link,
+                source=source,
+                published=getattr(entry, "published", ""),
+            )
         )
 
     return results
+
+
+class GoogleNewsSource(Source):
+    """Google News RSS search results."""
+
+    name = "google"
+
+    def fetch(self, query, limit):
+        return _fetch_feed(query, limit, self.name)
+
+
+# Limits: GOOGLE_NEWS_RATE, GOOGLE_NEWS_BURST, GOOGLE_NEWS_TIMEOUT_S, ... (see scrapers/base.py).
+google_news_source = GoogleNewsSource.from_env("GOOGLE_NEWS")
+
+
+def fetch_google_news(keyword, max_results=10):
+    try:
+        return [post.to_dict() for post in google_news_source.search_sync(keyword, max_results)]
+    except Exception as e:
+        print(f"[ERROR] Failed to fetch Google News feed: {e!r}")
+        return []
@@ -0,0 +1,270 @@
+"""
+Materialized social context for trending search terms.
+
+Handlers record every search term they look up. A background scheduler
+takes the most frequent terms, refreshes their results from the prefetch
+sources (Reddit and Google News) on an interval, and stores them in sqlite.
+Handlers then read stored posts with one primary-key lookup and only go to
+the upstream APIs for terms (or sources) that are not materialized.
+
+Several processes (gunicorn workers, web_app, app.py) can share one sqlite
+file. Term counts are buffered in memory and flushed on every scheduler
+tick. A lease row makes sure only one process refreshes per interval.
+Counts decay by half after every refresh, so terms stop trending once they
+are no longer being asked for.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import tempfile
+import threading
+from collections import Counter
+
+from scrapers.base import Post, SourceResult, fan_out
+
+PREFETCH_ENABLED = os.getenv("SOCIAL_PREFETCH", "1") == "1"
+PREFETCH_DB = os.getenv("SOCIAL_PREFETCH_DB", os.path.join(tempfile.gettempdir(), "social_context.sqlite"))
+PREFETCH_INTERVAL_S = float(os.getenv("SOCIAL_PREFETCH_INTERVAL_S", "120"))
+PREFETCH_TOP_N = int(os.getenv("SOCIAL_PREFETCH_TOP_N", "50"))
+PREFETCH_MAX_AGE_S = float(os.getenv("SOCIAL_PREFETCH_MAX_AGE_S", str(2 * PREFETCH_INTERVAL_S)))
+PREFETCH_LIMIT = 5
+FLUSH_INTERVAL_S = 5.0
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+class ContextStore:
+    """sqlite tables for stored posts, term counts and the refresh lease."""
+
+    def __init__(self, db_path=PREFETCH_DB):
+        self._db_path = db_path
+        self._db_conn = None
+        self._db_pid = None
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS social_context ("
+                "source TEXT, query TEXT, lim INTEGER, posts TEXT, updated REAL, "
+                "PRIMARY KEY (source, query, lim));"
+                "CREATE TABLE IF NOT EXISTS query_counts (query TEXT PRIMARY KEY, count REAL, last_seen REAL);"
+                "CREATE TABLE IF NOT EXISTS prefetch_lease (name TEXT PRIMARY KEY, holder TEXT, expires REAL);"
+            )
+
+    @property
+    def _db(self):
+        # sqlite connections must not be shared across fork; reopen in children.
+        if self._db_pid != os.getpid():
+            self._db_conn = sqlite3.connect(self._db_path, timeout=5, check_same_thread=False)
+            self._db_conn.execute("PRAGMA journal_mode=WAL")
+            self._db_pid = os.getpid()
+        return self._db_conn
+
+    def get(self, source, query, limit, max_age_s):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT posts, updated FROM social_context WHERE source = ? AND query = ? AND lim = ?",
+                (source, normalize_query(query), limit),
+            ).fetchone()
+        if row is None or time.time() - row[1] > max_age_s:
+            return None
+        return [Post(**p) for p in json.loads(row[0])]
+
+    def put(self, source, query, limit, posts):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO social_context (source, query, lim, posts, updated) VALUES (?, ?, ?, ?, ?)",
+                (source, normalize_query(query), limit, json.dumps([p.to_dict() for p in posts]), time.time()),
+            )
+            self._db.commit()
+
+    def add_counts(self, counts):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO query_counts (query, count, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT(query) DO UPDATE SET count = count + excluded.count, last_seen = excluded.last_seen",
+                [(query, count, now) for query, count in counts.items()],
+            )
+            self._db.commit()
+
+    def top_queries(self, n):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT query FROM query_counts ORDER BY count DESC, last_seen DESC LIMIT ?", (n,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def decay(self, max_age_s):
+        """Halve every count; forget terms that faded out and posts nobody refreshes any more."""
+        with self._lock:
+            self._db.execute("UPDATE query_counts SET count = count / 2")
+            self._db.execute("DELETE FROM query_counts WHERE count < 0.5")
+            self._db.execute("DELETE FROM social_context WHERE updated < ?", (time.time() - max_age_s,))
+            self._db.commit()
+
+    def try_lease(self, holder, duration_s, name="refresh"):
+        """True if `holder` now owns the lease (it was free, expired or already ours)."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO prefetch_lease (name, holder, expires) VALUES (?, '', 0)", (name,))
+            cursor = self._db.execute(
+                "UPDATE prefetch_lease SET holder = ?, expires = ? WHERE name = ? AND (expires < ? OR holder = ?)",
+                (holder, now + duration_s, name, now, holder),
+            )
+            self._db.commit()
+            return cursor.rowcount == 1
+
+
+class Prefetcher:
+    """Tracks search terms and keeps the top ones materialized in a ContextStore."""
+
+    def __init__(self, sources, store, interval_s=PREFETCH_INTERVAL_S, top_n=PREFETCH_TOP_N,
+                 max_age_s=PREFETCH_MAX_AGE_S, limit=PREFETCH_LIMIT):
+        self.sources = list(sources)
+        self.store = store
+        self.interval_s = interval_s
+        self.top_n = top_n
+        self.max_age_s = max_age_s
+        self.limit = limit
+        self._counts = Counter()
+        self._counts_lock = threading.Lock()
+        self._holder = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_refresh = 0.0
+
+    @classmethod
+    def from_env(cls, sources):
+        """The configured prefetcher, or None when SOCIAL_PREFETCH=0 or the store cannot be opened."""
+        if not PREFETCH_ENABLED:
+            return None
+        try:
+            return cls(sources, ContextStore(PREFETCH_DB))
+        except sqlite3.Error as e:
+            print(f"[WARN] Social-context prefetch disabled, cannot open {PREFETCH_DB}: {e}")
+            return None
+
+    def record(self, query):
+        with self._counts_lock:
+            self._counts[normalize_query(query)] += 1
+
+    def lookup(self, query, limit=PREFETCH_LIMIT):
+        """{source name: posts} for the prefetch sources that have fresh stored results."""
+        stored = {}
+        if limit != self.limit:
+            return stored
+        for source in self.sources:
+            posts = self.store.get(source.name, query, limit, self.max_age_s)
+            if posts is not None:
+                stored[source.name] = posts
+        return stored
+
+    def flush(self):
+        with self._counts_lock:
+            counts, self._counts = self._counts, Counter()
+        if counts:
+            self.store.add_counts(counts)
+
+    async def _refresh(self, queries):
+        # Use at most half of each source's in-flight slots, leaving the rest
+        # to live requests; the token bucket spreads the calls out over time.
+        slots = {source.name: asyncio.Semaphore(max(1, source.max_in_flight // 2)) for source in self.sources}
+
+        async def one(source, query):
+            try:
+                async with slots[source.name]:
+                    # refresh() skips the scraper cache but keeps rate limits and the breaker.
+                    posts = await source.refresh(query, self.limit)
+                self.store.put(source.name, query, self.limit, posts)
+            except Exception as e:
+                print(f"[WARN] Prefetch of {source.name} for '{query}' failed: {e!r}")
+
+        await asyncio.gather(*(one(source, query) for query in queries for source in self.sources))
+
+    def refresh_now(self):
+        """One refresh cycle: flush counts, and refresh the top terms if we hold the lease."""
+        self.flush()
+        now = time.time()
+        if now < self._next_refresh or not self.store.try_lease(self._holder, self.interval_s):
+            return 0
+        self._next_refresh = now + self.interval_s
+        queries = self.store.top_queries(self.top_n)
+        if queries:
+            start = time.perf_counter()
+            asyncio.run(self._refresh(queries))
+            print(f"[INFO] Prefetched social context for {len(queries)} terms "
+                  f"in {time.perf_counter() - start:.1f}s")
+        self.store.decay(self.max_age_s)
+        return len(queries)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh_now()
+            except Exception as e:
+                print(f"[ERROR] Social-context prefetch failed: {e!r}")
+            self._stop.wait(min(FLUSH_INTERVAL_S, self.interval_s))
+
+    def start(self):
+        """Start the scheduler thread (idempotent; call in each worker after fork)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="social-prefetch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+
+def _record_and_lookup(prefetcher, query, limit):
+    prefetcher.record(query)
+    return prefetcher.lookup(query, limit)
+
+
+async def fan_out_prefetched(prefetcher, sources, query, limit, deadline=None):
+    """
+    Like fan_out, but sources with materialized results are answered from the
+    store right away (with `prefetched` set); only the others go upstream.
+    Also records `query` as asked for, so trending terms get prefetched.
+    """
+    stored = {}
+    if prefetcher is not None:
+        # sqlite reads; keep them off the event loop.
+        stored = await asyncio.to_thread(_record_and_lookup, prefetcher, query, limit)
+    for name, posts in stored.items():
+        yield SourceResult(name, posts, prefetched=True)
+    remaining = [source for source in sources if source.name not in stored]
+    if remaining:
+        async for result in fan_out(remaining, query, limit, deadline):
+            yield result
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher():
+    """The shared prefetcher for Reddit (r/news) and Google News, or None when disabled."""
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                from scrapers.reddit_scraper import reddit_source
+                from scrapers.google_news_scraper import google_news_source
+
+                _prefetcher = Prefetcher.from_env([reddit_source, google_news_source]) or False
+    return _prefetcher or None
+
+
+def start_prefetching():
+    """Start the shared prefetcher's scheduler, if prefetching is enabled."""
+    prefetcher = get_prefetcher()
+    if prefetcher is not None:
+        prefetcher.start()
+    return prefetcher
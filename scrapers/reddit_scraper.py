@@ -1,53 +1,97 @@
 import os
+import threading
 import praw
 from dotenv import load_dotenv
 
+from scrapers.base import Source, Post
+from scrapers.cache import make_key
+
 load_dotenv()
 
+_client = None
+_client_lock = threading.Lock()
+_client_initialized = False
+
 
 def _get_reddit_client():
     """
-    Initialize and return a read-only Reddit client.
+    Return the shared read-only Reddit client, creating it on first use.
+    praw keeps one HTTP session per client, so reusing it pools connections.
     Returns None if credentials are missing or invalid.
     """
-    client_id = os.getenv("REDDIT_CLIENT_ID")
-    client_secret = os.getenv("REDDIT_CLIENT_SECRET")
-    user_agent = os.getenv("REDDIT_USER_AGENT")
+    global _client, _client_initialized
+    if _client_initialized:
+        return _client
 
-    if not client_id or not client_secret or not user_agent:
-        print("[ERROR] Reddit credentials missing. "
-              "Check REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT in .env")
-        return None
+    with _client_lock:
+        if _client_initialized:
+            return _client
 
-    try:
-        reddit = praw.Reddit(
-            client_id=client_id,
-            client_secret=client_secret,
-            user_agent=user_agent,
-        )
-        reddit.read_only = True
-        return reddit
-    except Exception as e:
-        print(f"[ERROR] Failed to initialize Reddit client: {e}")
-        return None
+        client_id = os.getenv("REDDIT_CLIENT_ID")
+        client_secret = os.getenv("REDDIT_CLIENT_SECRET")
+        user_agent = os.getenv("REDDIT_USER_AGENT")
+
+        if not client_id or not client_secret or not user_agent:
+            print("[ERROR] Reddit credentials missing. "
+                  "Check REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT in .env")
+        else:
+            try:
+                reddit = praw.Reddit(
+                    client_id=client_id,
+                    client_secret=client_secret,
+                    user_agent=user_agent,
+                )
+                reddit.read_only = True
+                _client = reddit
+            except Exception as e:
+                print(f"[ERROR] Failed to initialize Reddit client: {e}")
+
+        _client_initialized = True
+        return _client
+
+
+class RedditSource(Source):
+    """Newest posts in one subreddit matching the query."""
+
+    name = "reddit"
+
+    def __init__(self, subreddit="news", **kwargs):
+        self.subreddit = subreddit
+        super().__init__(**kwargs)
+
+    def cache_key(self, query, limit):
+        return make_key(self.name, query, self.subreddit, limit)
+
+    def fetch(self, query, limit):
+        reddit = _get_reddit_client()
+        if reddit is None:
+            return []  # credentials / client issue, already logged once
+        posts = reddit.subreddit(self.subreddit).search(query, sort="new", limit=limit)
+        return [Post(text=post.title, url=post.url, source=self.name) for post in posts]
+
+
+# Limits: REDDIT_RATE, REDDIT_BURST, REDDIT_TIMEOUT_S, ... (see scrapers/base.py).
+reddit_source = RedditSource.from_env("REDDIT")
+_sources = {"news": reddit_source}
+_sources_lock = threading.Lock()
+
+
+def get_reddit_source(subreddit="news"):
+    with _sources_lock:
+        if subreddit not in _sources:
+            _sources[subreddit] = RedditSource.from_env("REDDIT", subreddit=subreddit)
+        return _sources[subreddit]
 
 
 def fetch_reddit_posts(keyword, subreddit="news", limit=10):
     """
     Fetch posts from Reddit matching the keyword.
-    Returns a list of dicts: { 'text': title, 'url': url }.
+    Returns a list of dicts: { 'text': title, 'url': url, ... }.
+    Results are cached per (subreddit, keyword, limit) for a few minutes.
     On any error, returns [] and logs what happened.
     """
-    reddit = _get_reddit_client()
-    if reddit is None:
-        # Credentials / client issue
-        return []
-
     try:
-        posts = reddit.subreddit(subreddit).search(
-            keyword, sort="new", limit=limit
-        )
-        return [{"text": post.title, "url": post.url} for post in posts]
+        return [post.to_dict() for post in get_reddit_source(subreddit).search_sync(keyword, limit)]
     except Exception as e:
-        print(f"[ERROR] Reddit API error while searching '{keyword}': {e}")
+        print(f"[ERROR] Reddit API error while searching '{keyword}': {e!r}")
         return []
@@ -1,16 +1,131 @@
-import subprocess
+import os
 import json
+import threading
+from itertools import islice
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scrapers.base import Source, Post
+
+HTTP_TIMEOUT_S = float(os.getenv("TWITTER_HTTP_TIMEOUT_S", "5"))
+
+# "snscrape" runs snscrape in-process. A URL instead streams JSONL tweets from
+# `<url>/search?q=...&limit=...`, e.g. a local fixture server or a sidecar.
+TRANSPORT = os.getenv("TWITTER_TRANSPORT", "snscrape")
+
+
+def _pooled_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv("TWITTER_POOL_SIZE", "10")))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class SnscrapeTransport:
+    """
+    snscrape used as a library: no shell, no interpreter per call. Every
+    search reuses one HTTP session, so connections stay alive between calls.
+    """
+
+    def __init__(self):
+        self.session = _pooled_session()
+
+    def search(self, query, limit):
+        from snscrape.modules.twitter import TwitterSearchScraper
+
+        scraper = TwitterSearchScraper(query)
+        # snscrape opens a fresh session per scraper; share ours instead.
+        if hasattr(scraper, "_session"):
+            scraper._session = self.session
+        for tweet in scraper.get_items():
+            yield {
+                "content": getattr(tweet, "rawContent", None) or getattr(tweet, "content", ""),
+                "url": tweet.url,
+                "date": tweet.date.isoformat() if tweet.date else "",
+            }
+
+
+class HttpJsonlTransport:
+    """Streams snscrape-style JSONL (one tweet per line) from `<base_url>/search`."""
+
+    def __init__(self, base_url, timeout=HTTP_TIMEOUT_S):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = _pooled_session()
+
+    def search(self, query, limit):
+        with self.session.get(
+            f"{self.base_url}/search", params={"q": query, "limit": limit},
+            stream=True, timeout=self.timeout,
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = SnscrapeTransport() if TRANSPORT == "snscrape" else HttpJsonlTransport(TRANSPORT)
+    return _transport
+
+
+def set_transport(transport):
+    """Use another transport (anything with search(query, limit) yielding tweet dicts)."""
+    global _transport
+    _transport = transport
+
+
+def _search_tweets(keyword, max_results, source="twitter"):
+    items = get_transport().search(keyword, max_results)
+    try:
+        # Stop as soon as we have enough; nothing after max_results is fetched.
+        return [
+            Post(
+                text=tweet.get("rawContent") or tweet.get("content", ""),
+                url=tweet.get("url", ""),
+                source=source,
+                published=tweet.get("date", ""),
+            )
+            for tweet in islice(items, max_results)
+        ]
+    finally:
+        close = getattr(items, "close", None)
+        if close is not None:
+            close()  # ends the generator: closes the HTTP response / stops snscrape
+
+
+class TwitterSource(Source):
+    """Recent tweets through the configured transport."""
+
+    name = "twitter"
+
+    def fetch(self, query, limit):
+        return _search_tweets(query, limit, self.name)
+
+
+# Limits: TWITTER_RATE, TWITTER_BURST, TWITTER_TIMEOUT_S, ... (see scrapers/base.py).
+twitter_source = TwitterSource.from_env("TWITTER", timeout=5.0)
+
 
 def fetch_tweets(keyword, max_results=10):
-    command = f"snscrape --jsonl --max-results {max_results} twitter-search \"{keyword}\""
-    result = subprocess.run(command, shell=True, capture_output=True, text=True)
-
-    tweets = []
-    for line in result.stdout.splitlines():
-        tweet = json.loads(line)
-        tweets.append({
-            "text": tweet.get("content", ""),
-            "url": tweet.get("url", ""),
-            "date": tweet.get("date", "")
-        })
-    return tweets
+    """
+    Fetch recent tweets matching the keyword.
+    Returns a list of dicts: { 'text', 'url', 'date', ... }.
+    Results are cached per (keyword, max_results) for a few minutes.
+    On any error, returns [] and logs what happened.
+    """
+    try:
+        return [dict(post.to_dict(), date=post.published) for post in twitter_source.search_sync(keyword, max_results)]
+    except Exception as e:
+        print(f"[ERROR] Twitter search failed for '{keyword}': {e!r}")
+        return []
@@ -1,41 +1,100 @@
-from flask import Flask, render_template, request
-from keybert import KeyBERT
+import os
+import time
+import uuid
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, abort, jsonify, render_template, request
 
 from model.predict import predict_news
-from scrapers.twitter_scraper import fetch_tweets
-from scrapers.reddit_scraper import fetch_reddit_posts
-from scrapers.google_news_scraper import fetch_google_news
+from model.keywords import build_search_term, standalone_backend
+from scrapers.prefetch import fan_out_prefetched, get_prefetcher, start_prefetching
+from scrapers.twitter_scraper import twitter_source
+from scrapers.reddit_scraper import reddit_source
+from scrapers.google_news_scraper import google_news_source
 
 app = Flask(__name__)
-kw_model = KeyBERT()
-
-
-def build_search_term(text: str) -> str:
-    """Build a good search term from the user input."""
-    words = text.split()
-
-    # For short headlines, just use the full text
-    if len(words) <= 12:
-        return text
-
-    # For longer text, use KeyBERT to extract keyphrases
-    keywords = kw_model.extract_keywords(
-        text,
-        keyphrase_ngram_range=(1, 2),
-        stop_words="english",
-        top_n=3,
-    )
-    keyphrases = [kw for kw, _ in keywords if len(kw.split()) > 1]
-    if not keyphrases:
-        keyphrases = [kw for kw, _ in keywords]
 
-    return " ".join(keyphrases)
+# Social context is fetched in the background: the page renders the verdict
+# right away and polls /context/<job_id>, which fills in each source as it
+# arrives. Jobs share one bounded pool, so a burst of REAL headlines queues
+# instead of starting unbounded threads. Per-source timeouts, retries, rate
+# limits and circuit breakers come from scrapers/base.py. Reddit and Google
+# News posts for trending terms are read from the prefetch store
+# (scrapers/prefetch.py) when it has them.
+CONTEXT_WORKERS = int(os.getenv("WEB_CONTEXT_WORKERS", "8"))
+MAX_CONTEXT_JOBS = int(os.getenv("WEB_MAX_CONTEXT_JOBS", "100"))
+CONTEXT_JOB_TTL_S = float(os.getenv("WEB_CONTEXT_JOB_TTL_S", "300"))
+CONTEXT_DEADLINE_S = float(os.getenv("SOCIAL_CONTEXT_DEADLINE_S", "6"))
+SOURCES = [twitter_source, reddit_source, google_news_source]
+
+context_executor = ThreadPoolExecutor(max_workers=CONTEXT_WORKERS, thread_name_prefix="social-context")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _set_source(job, name, status, posts=()):
+    with _jobs_lock:
+        job["sources"][name].update(status=status, posts=[post.to_dict() for post in posts])
+
+
+async def _collect(job, search_term):
+    async for result in fan_out_prefetched(get_prefetcher(), SOURCES, search_term, 5, deadline=CONTEXT_DEADLINE_S):
+        if result.error is None:
+            _set_source(job, result.source, "done", result.posts)
+        else:
+            print(f"[WARN] {result.source} fetch failed: {result.error!r}")
+            timed_out = isinstance(result.error, asyncio.TimeoutError)
+            _set_source(job, result.source, "timeout" if timed_out else "error")
+
+
+def _run_context_job(job, headline):
+    try:
+        search_term = build_search_term(headline, standalone_backend())
+    except Exception as e:
+        print(f"[ERROR] Building search term failed: {e}")
+        search_term = headline
+
+    with _jobs_lock:
+        job["search_term"] = search_term
+    asyncio.run(_collect(job, search_term))
+
+
+def start_context_job(headline):
+    """Queue the social-context lookup for `headline`; returns the job id, or None when busy."""
+    now = time.time()
+    with _jobs_lock:
+        for job_id in [j for j, job in _jobs.items() if now - job["created"] > CONTEXT_JOB_TTL_S]:
+            del _jobs[job_id]
+        if len(_jobs) >= MAX_CONTEXT_JOBS:
+            return None
+        job_id = uuid.uuid4().hex
+        job = {
+            "created": now,
+            "search_term": None,
+            "sources": {source.name: {"status": "pending", "posts": []} for source in SOURCES},
+        }
+        _jobs[job_id] = job
+
+    context_executor.submit(_run_context_job, job, headline)
+    return job_id
+
+
+def context_snapshot(job):
+    with _jobs_lock:
+        sources = {name: {"status": s["status"], "posts": s["posts"]} for name, s in job["sources"].items()}
+        return {
+            "search_term": job["search_term"],
+            "sources": sources,
+            "done": all(s["status"] != "pending" for s in sources.values()),
+        }
 
 
 @app.route("/", methods=["GET", "POST"])
 def index():
     result = None
-    context = {"twitter": [], "reddit": [], "google": []}
+    context_job = None
 
     if request.method == "POST":
         headline = request.form.get("headline", "").strip()
@@ -54,24 +113,24 @@ def index():
                 },
             }
 
-            # Only fetch context if model predicts REAL
+            # Only fetch context if model predicts REAL; it loads in the background.
             if label.upper() == "REAL":
-                search_term = build_search_term(headline)
+                context_job = start_context_job(headline)
 
-                twitter_posts = fetch_tweets(search_term, max_results=5)
-                reddit_posts = fetch_reddit_posts(search_term, limit=5)
-                google_posts = fetch_google_news(search_term, max_results=5)
+    return render_template("index.html", result=result, context_job=context_job)
 
-                context = {
-                    "search_term": search_term,
-                    "twitter": twitter_posts,
-                    "reddit": reddit_posts,
-                    "google": google_posts,
-                }
 
-    return render_template("index.html", result=result, context=context)
+@app.route("/context/<job_id>")
+def context(job_id):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(context_snapshot(job))
 
 
 if __name__ == "__main__":
-    # Run with: python web_app.py
-    app.run(debug=True)
+    # Local development only: python web_app.py
+    # In production, serve wsgi.py with gunicorn (see the docstring there).
+    start_prefetching()
+    app.run(debug=os.getenv("FLASK_DEBUG", "0") == "1", threaded=True)
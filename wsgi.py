@@ -0,0 +1,23 @@
+"""
+Production entry point for the Flask web app (web_app.py).
+
+    gunicorn --workers 1 --threads 16 --bind 0.0.0.0:5000 wsgi:app
+
+Social-context jobs live in the serving process, and /context/<job_id> must
+reach the process that started the job. Use one worker with threads (the
+model already uses every core per forward), or sticky sessions when running
+several workers behind a load balancer.
+"""
+import os
+import threading
+
+from model.predict import warmup
+from web_app import app
+from scrapers.prefetch import start_prefetching
+
+# Load and warm up the model in the background so the first request does not pay for it.
+if os.getenv("WEB_WARMUP", "1") == "1":
+    threading.Thread(target=warmup, name="model-warmup", daemon=True).start()
+
+# Keep social context for trending search terms materialized (SOCIAL_PREFETCH=0 turns it off).
+start_prefetching()